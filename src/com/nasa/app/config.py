@@ -1,3 +1,5 @@
+import os
+import socket
 from dataclasses import dataclass
 from typing import Optional, List
 from com.nasa.common.utils import env_bool, env_float, env_int, env_str
@@ -6,6 +8,7 @@ from com.nasa.common.utils import env_bool, env_float, env_int, env_str
 class AppConfig:
     manual_ports: Optional[List[str]]
     baudrate: int
+    baud_candidates: List[int]
     scan_interval_s: float
     probe_timeout_s: float
     serial_timeout_s: float
@@ -14,19 +17,71 @@ class AppConfig:
     redis_url: str
     otp_ttl_seconds: int
     otp_key_prefix: str
+    otp_value_format: str
+    otp_legacy_sender_key: bool
     otp_regex: str
     delete_after_read: bool
 
+    watchdog_enabled: bool
+    watchdog_idle_s: float
+    watchdog_timeout_s: float
+    watchdog_max_failures: int
+    watchdog_reset_wait_s: float
+
+    pipeline_parse_workers: int
+    pipeline_publish_workers: int
+    pipeline_queue_size: int
+    pipeline_enqueue_timeout_s: float
+    pipeline_metrics_interval_s: float
+
+    http_enabled: bool
+    http_host: str
+    http_port: int
+    http_max_wait_s: float
+    http_index_max_entries: int
+
+    sim_pool_enabled: bool
+    sim_pool_key_prefix: str
+    sim_pool_strategy: str
+    sim_pool_lease_ttl_s: float
+    sim_pool_cooldown_s: float
+    sim_pool_sync_interval_s: float
+
+    trace_enabled: bool
+    trace_file: str
+    trace_max_bytes: int
+    trace_backup_count: int
+
+    cluster_enabled: bool
+    cluster_host_id: str
+    cluster_key_prefix: str
+    cluster_lease_ttl_s: float
+    cluster_heartbeat_s: float
+
+    jobs_enabled: bool
+    jobs_key_prefix: str
+    jobs_poll_interval_s: float
+    jobs_rate_limit_per_s: int
+    jobs_result_ttl_seconds: int
+
     log_level: str
     log_file: str
+    log_max_bytes: int
+    log_backup_count: int
+    log_rotate_when: str
+    log_rate_limit_window_s: float
+    log_rate_limit_burst: int
 
 def load_config() -> AppConfig:
     ports_raw = env_str("SERIAL_PORTS", "").strip()
     manual_ports = [p.strip() for p in ports_raw.split(",") if p.strip()] if ports_raw else None
+    baud_raw = env_str("BAUD_CANDIDATES", "921600,460800,230400")
+    baud_candidates = [int(b) for b in baud_raw.split(",") if b.strip()] if env_bool("BAUD_NEGOTIATE", False) else []
 
     return AppConfig(
         manual_ports=manual_ports,
         baudrate=env_int("BAUDRATE", 115200),
+        baud_candidates=baud_candidates,
         scan_interval_s=env_float("SCAN_INTERVAL_SECONDS", 3.0),
         probe_timeout_s=float(env_str("PROBE_TIMEOUT_SECONDS", "1.2")),
         serial_timeout_s=float(env_str("SERIAL_TIMEOUT_SECONDS", "2.0")),
@@ -35,9 +90,58 @@ def load_config() -> AppConfig:
         redis_url=env_str("REDIS_URL", "redis://localhost:6379/0"),
         otp_ttl_seconds=env_int("OTP_TTL_SECONDS", 300),
         otp_key_prefix=env_str("OTP_KEY_PREFIX", "otp:"),
+        otp_value_format=env_str("OTP_VALUE_FORMAT", "json"),
+        otp_legacy_sender_key=env_bool("OTP_LEGACY_SENDER_KEY", True),
         otp_regex=env_str("OTP_REGEX", r"\b(\d{4,8})\b"),
         delete_after_read=env_bool("DELETE_AFTER_READ", True),
 
+        watchdog_enabled=env_bool("WATCHDOG_ENABLED", True),
+        watchdog_idle_s=env_float("WATCHDOG_IDLE_SECONDS", 30.0),
+        watchdog_timeout_s=env_float("WATCHDOG_TIMEOUT_SECONDS", 2.0),
+        watchdog_max_failures=env_int("WATCHDOG_MAX_FAILURES", 3),
+        watchdog_reset_wait_s=env_float("WATCHDOG_RESET_WAIT_SECONDS", 20.0),
+
+        pipeline_parse_workers=env_int("PIPELINE_PARSE_WORKERS", 2),
+        pipeline_publish_workers=env_int("PIPELINE_PUBLISH_WORKERS", 4),
+        pipeline_queue_size=env_int("PIPELINE_QUEUE_SIZE", 1000),
+        pipeline_enqueue_timeout_s=env_float("PIPELINE_ENQUEUE_TIMEOUT_SECONDS", 0.05),
+        pipeline_metrics_interval_s=env_float("PIPELINE_METRICS_INTERVAL_SECONDS", 60.0),
+
+        http_enabled=env_bool("HTTP_ENABLED", False),
+        http_host=env_str("HTTP_HOST", "127.0.0.1"),
+        http_port=env_int("HTTP_PORT", 8080),
+        http_max_wait_s=env_float("HTTP_MAX_WAIT_SECONDS", 60.0),
+        http_index_max_entries=env_int("HTTP_INDEX_MAX_ENTRIES", 10000),
+
+        sim_pool_enabled=env_bool("SIM_POOL_ENABLED", False),
+        sim_pool_key_prefix=env_str("SIM_POOL_KEY_PREFIX", "sim:"),
+        sim_pool_strategy=env_str("SIM_POOL_STRATEGY", "lru"),
+        sim_pool_lease_ttl_s=env_float("SIM_POOL_LEASE_TTL_SECONDS", 120.0),
+        sim_pool_cooldown_s=env_float("SIM_POOL_COOLDOWN_SECONDS", 300.0),
+        sim_pool_sync_interval_s=env_float("SIM_POOL_SYNC_SECONDS", 5.0),
+
+        trace_enabled=env_bool("TRACE_ENABLED", True),
+        trace_file=env_str("TRACE_FILE", "logs/sms_trace.jsonl"),
+        trace_max_bytes=env_int("TRACE_MAX_BYTES", 20 * 1024 * 1024),
+        trace_backup_count=env_int("TRACE_BACKUP_COUNT", 5),
+
+        cluster_enabled=env_bool("CLUSTER_ENABLED", False),
+        cluster_host_id=env_str("CLUSTER_HOST_ID", "") or f"{socket.gethostname()}:{os.getpid()}",
+        cluster_key_prefix=env_str("CLUSTER_KEY_PREFIX", "farm:"),
+        cluster_lease_ttl_s=env_float("CLUSTER_LEASE_TTL_SECONDS", 10.0),
+        cluster_heartbeat_s=env_float("CLUSTER_HEARTBEAT_SECONDS", 3.0),
+
+        jobs_enabled=env_bool("JOBS_ENABLED", False),
+        jobs_key_prefix=env_str("JOBS_KEY_PREFIX", "jobs:"),
+        jobs_poll_interval_s=env_float("JOBS_POLL_INTERVAL_SECONDS", 1.0),
+        jobs_rate_limit_per_s=env_int("JOBS_RATE_LIMIT_PER_SECOND", 5),
+        jobs_result_ttl_seconds=env_int("JOBS_RESULT_TTL_SECONDS", 3600),
+
         log_level=env_str("LOG_LEVEL", "INFO"),
         log_file=env_str("LOG_FILE", "logs/app.log"),
+        log_max_bytes=env_int("LOG_MAX_BYTES", 50 * 1024 * 1024),
+        log_backup_count=env_int("LOG_BACKUP_COUNT", 10),
+        log_rotate_when=env_str("LOG_ROTATE_WHEN", ""),
+        log_rate_limit_window_s=env_float("LOG_RATE_LIMIT_WINDOW_SECONDS", 60.0),
+        log_rate_limit_burst=env_int("LOG_RATE_LIMIT_BURST", 5),
     )
@@ -1,20 +1,177 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
 
-def setup_logging(level: str = "INFO", log_file: str = "logs/app.log") -> None:
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["_DropOnFullQueueHandler"] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Chặn spam log lặp lại (AT TIMEOUT/ERROR ...) theo từng subsystem.
+
+    Key = (logger name, message template, arg đầu tiên - thường là port), nên mỗi
+    port bị giới hạn riêng. Chỉ áp dụng cho record >= min_level; trong mỗi cửa sổ
+    `window_s` cho qua tối đa `burst` record, phần còn lại bị đếm và báo gộp ở
+    record kế tiếp được cho qua.
+    """
+
+    def __init__(self, window_s: float = 60.0, burst: int = 5, min_level: int = logging.WARNING):
+        super().__init__()
+        self.window_s = window_s
+        self.burst = burst
+        self.min_level = min_level
+        self._lock = threading.Lock()
+        # key -> [window_start, count_in_window, suppressed]
+        self._state: Dict[Tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window_s <= 0 or record.levelno < self.min_level:
+            return True
+
+        first_arg = record.args[0] if isinstance(record.args, tuple) and record.args else None
+        key = (record.name, record.msg, first_arg if isinstance(first_arg, (str, int)) else None)
+        now = time.monotonic()
+        with self._lock:
+            st = self._state.get(key)
+            if st is None or now - st[0] >= self.window_s:
+                suppressed = st[2] if st else 0
+                self._state[key] = [now, 1, 0]
+                if len(self._state) > 10000:
+                    self._state.clear()
+            elif st[1] < self.burst:
+                st[1] += 1
+                suppressed = 0
+            else:
+                st[2] += 1
+                return False
+
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar in last {self.window_s:.0f}s)"
+        return True
+
+
+def setup_logging(level: str = "INFO",
+                  log_file: str = "logs/app.log",
+                  max_bytes: int = 50 * 1024 * 1024,
+                  backup_count: int = 10,
+                  rotate_when: str = "",
+                  rate_limit_window_s: float = 60.0,
+                  rate_limit_burst: int = 5,
+                  queue_size: int = 10000) -> logging.handlers.QueueListener:
+    """
+    Root logger chỉ gắn 1 QueueHandler: thread nghiệp vụ chỉ enqueue record,
+    việc format + ghi stdout/file do QueueListener làm trên thread riêng.
+
+    File log rotate theo dung lượng (`max_bytes`) hoặc theo thời gian nếu
+    `rotate_when` được set (vd "midnight", "H").
+    """
+    global _listener, _queue_handler
+    stop_logging()
     os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
 
     lvl = getattr(logging, level.upper(), logging.INFO)
-    fmt = "%(asctime)s %(levelname)-5s [%(threadName)s] [%(name)s] %(message)s"
+    fmt = logging.Formatter("%(asctime)s %(levelname)-5s [%(threadName)s] [%(name)s] %(message)s")
+
+    sh = logging.StreamHandler()
+    sh.setFormatter(fmt)
+
+    if rotate_when:
+        fh = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8")
+    else:
+        fh = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    fh.setFormatter(fmt)
+
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    qh = _DropOnFullQueueHandler(q, report_interval_s=rate_limit_window_s or 60.0)
+    qh.addFilter(RateLimitFilter(window_s=rate_limit_window_s, burst=rate_limit_burst))
 
     root = logging.getLogger()
     root.setLevel(lvl)
     root.handlers.clear()
+    root.addHandler(qh)
 
-    sh = logging.StreamHandler()
-    sh.setFormatter(logging.Formatter(fmt))
-    root.addHandler(sh)
+    _queue_handler = qh
+    _listener = logging.handlers.QueueListener(q, sh, fh, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    """Flush các record còn trong queue, báo số record bị drop chưa báo, rồi dừng listener thread."""
+    global _listener, _queue_handler
+    listener, _listener = _listener, None
+    qh, _queue_handler = _queue_handler, None
+    if listener is not None:
+        try:
+            listener.stop()
+        except Exception:
+            pass
+        report = qh.drop_report() if qh is not None else None
+        for h in listener.handlers:
+            if report is not None:
+                try:
+                    h.handle(report)
+                except Exception:
+                    pass
+            try:
+                h.close()
+            except Exception:
+                pass
+
+
+class _DropOnFullQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue đầy (disk/stdout bị nghẽn) thì bỏ record thay vì block worker thread.
+    Số record bị drop được báo bằng 1 WARNING khi queue có chỗ trở lại (tối đa 1 lần mỗi
+    `report_interval_s`) và lần cuối trong `stop_logging()`.
+    """
+
+    def __init__(self, q: "queue.Queue", report_interval_s: float = 60.0):
+        super().__init__(q)
+        self.report_interval_s = report_interval_s
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._reported = 0
+        self._last_report = time.monotonic()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Listener cùng process nên không cần format/pickle trước;
+        # việc format message để dành cho listener thread.
+        return record
+
+    def drop_report(self) -> Optional[logging.LogRecord]:
+        """Record WARNING cho số record bị drop từ lần báo trước (None nếu không có)."""
+        with self._lock:
+            pending = self.dropped - self._reported
+            if pending <= 0:
+                return None
+            self._reported = self.dropped
+            self._last_report = time.monotonic()
+            total = self.dropped
+        return logging.getLogger(__name__).makeRecord(
+            __name__, logging.WARNING, __file__, 0,
+            "log queue full: dropped %s records (total %s)", (pending, total), None)
 
-    fh = logging.FileHandler(log_file, encoding="utf-8")
-    fh.setFormatter(logging.Formatter(fmt))
-    root.addHandler(fh)
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.dropped > self._reported and time.monotonic() - self._last_report >= self.report_interval_s:
+            report = self.drop_report()
+            if report is not None:
+                try:
+                    self.queue.put_nowait(report)
+                except queue.Full:
+                    with self._lock:
+                        self._reported -= report.args[0]
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
@@ -1,36 +1,117 @@
 from dotenv import load_dotenv
 
 from com.nasa.app.config import load_config
-from com.nasa.app.loggingconfig import setup_logging
+from com.nasa.app.loggingconfig import setup_logging, stop_logging
 from com.nasa.cache.redis.redis_client import create_redis
+from com.nasa.cache.redis.job_queue import RedisJobQueue, RedisJobQueueConfig
+from com.nasa.cache.redis.modem_registry import RedisModemRegistry, RedisModemRegistryConfig
 from com.nasa.cache.redis.otp_cache import RedisOtpCache, RedisOtpCacheConfig
+from com.nasa.cache.redis.sim_pool import RedisSimPool, RedisSimPoolConfig
+from com.nasa.cache.memory.recent_otp_index import RecentOtpIndex
+from com.nasa.infra.http.otp_http_server import OtpHttpConfig, OtpHttpServer
+from com.nasa.infra.tracing.sms_tracer import SmsTracer, SmsTracerConfig
+from com.nasa.services.job_dispatcher_service import JobDispatcherService
+from com.nasa.services.modem_watchdog_service import ModemWatchdogConfig
 from com.nasa.services.otp_extract_service import OtpExtractService
 from com.nasa.services.port_manager_service import PortManagerService
+from com.nasa.services.sim_pool_service import SimPoolSyncService
+from com.nasa.services.sms_pipeline_service import SmsPipeline, SmsPipelineConfig
 import logging
+import socket
 
 def main():
     logger = logging.getLogger(__name__)
     load_dotenv()
     cfg = load_config()
-    setup_logging(cfg.log_level, cfg.log_file)
+    setup_logging(
+        cfg.log_level,
+        cfg.log_file,
+        max_bytes=cfg.log_max_bytes,
+        backup_count=cfg.log_backup_count,
+        rotate_when=cfg.log_rotate_when,
+        rate_limit_window_s=cfg.log_rate_limit_window_s,
+        rate_limit_burst=cfg.log_rate_limit_burst,
+    )
 
     r = create_redis(cfg.redis_url)
-    otp_cache = RedisOtpCache(r, RedisOtpCacheConfig(ttl_seconds=cfg.otp_ttl_seconds, key_prefix=cfg.otp_key_prefix))
+    otp_cache = RedisOtpCache(
+        create_redis(cfg.redis_url, decode_responses=False),
+        RedisOtpCacheConfig(ttl_seconds=cfg.otp_ttl_seconds, key_prefix=cfg.otp_key_prefix,
+                            value_format=cfg.otp_value_format,
+                            legacy_sender_key=cfg.otp_legacy_sender_key),
+    )
     extractor = OtpExtractService(cfg.otp_regex)
+    tracer = SmsTracer(SmsTracerConfig(
+        enabled=cfg.trace_enabled,
+        file=cfg.trace_file,
+        max_bytes=cfg.trace_max_bytes,
+        backup_count=cfg.trace_backup_count,
+    ))
+    tracer.start()
+    pipeline = SmsPipeline(SmsPipelineConfig(
+        parse_workers=cfg.pipeline_parse_workers,
+        publish_workers=cfg.pipeline_publish_workers,
+        queue_size=cfg.pipeline_queue_size,
+        enqueue_timeout_s=cfg.pipeline_enqueue_timeout_s,
+        metrics_interval_s=cfg.pipeline_metrics_interval_s,
+    ), extractor, otp_cache, tracer=tracer)
+    pipeline.start()
+
+    sim_pool = None
+    if cfg.sim_pool_enabled:
+        sim_pool = RedisSimPool(r, RedisSimPoolConfig(
+            key_prefix=cfg.sim_pool_key_prefix,
+            strategy=cfg.sim_pool_strategy,
+            lease_ttl_seconds=cfg.sim_pool_lease_ttl_s,
+            cooldown_seconds=cfg.sim_pool_cooldown_s,
+            alive_ttl_seconds=cfg.sim_pool_sync_interval_s * 3,
+        ))
 
-    def sms_service_factory(port: str, imei: str):
+    http_server = None
+    if cfg.http_enabled:
+        # index in-memory dùng cùng TTL với Redis, được feed ngay trước khi ghi Redis
+        # -> /otp/wait trả về không phải chờ round trip Redis
+        index = RecentOtpIndex(ttl_s=cfg.otp_ttl_seconds, max_entries=cfg.http_index_max_entries)
+        pipeline.add_listener(index.add, before_commit=True)
+        http_server = OtpHttpServer(OtpHttpConfig(host=cfg.http_host, port=cfg.http_port,
+                                                  max_wait_s=cfg.http_max_wait_s), index, sim_pool=sim_pool)
+        http_server.start()
+
+    if sim_pool is not None:
+        # chạy sau khi OTP đã ghi Redis; waiter /otp/wait đã được đánh thức trước đó
+        pipeline.add_listener(sim_pool.release_on_otp)
+
+    watchdog_cfg = ModemWatchdogConfig(
+        enabled=cfg.watchdog_enabled,
+        idle_s=cfg.watchdog_idle_s,
+        timeout_s=cfg.watchdog_timeout_s,
+        max_failures=cfg.watchdog_max_failures,
+        reset_wait_s=cfg.watchdog_reset_wait_s,
+    )
+
+    def sms_service_factory(port: str, imei: str, baudrate: int):
         from com.nasa.services.sms_service import SmsService
         return SmsService(
             port=port,
             imei=imei,
-            baudrate=cfg.baudrate,
+            baudrate=baudrate,
             serial_timeout_s=cfg.serial_timeout_s,
             poll_interval_s=cfg.poll_interval_s,
             delete_after_read=cfg.delete_after_read,
-            otp_extractor=extractor,
-            otp_cache=otp_cache
+            pipeline=pipeline,
+            watchdog_cfg=watchdog_cfg,
         )
 
+    registry = None
+    if cfg.cluster_enabled:
+        registry = RedisModemRegistry(r, RedisModemRegistryConfig(
+            host_id=cfg.cluster_host_id,
+            node=socket.gethostname(),
+            key_prefix=cfg.cluster_key_prefix,
+            lease_ttl_seconds=cfg.cluster_lease_ttl_s,
+        ))
+        logger.info("cluster mode host_id=%s lease_ttl=%ss", cfg.cluster_host_id, cfg.cluster_lease_ttl_s)
+
     pm = PortManagerService(
         manual_ports=cfg.manual_ports,
         baudrate=cfg.baudrate,
@@ -38,14 +119,43 @@ def main():
         probe_timeout_s=cfg.probe_timeout_s,
         serial_timeout_s=cfg.serial_timeout_s,
         poll_interval_s=cfg.poll_interval_s,
-        sms_service_factory=sms_service_factory
+        sms_service_factory=sms_service_factory,
+        registry=registry,
+        cluster_heartbeat_s=cfg.cluster_heartbeat_s,
+        baud_candidates=cfg.baud_candidates,
     )
+
+    dispatcher = None
+    if cfg.jobs_enabled:
+        job_queue = RedisJobQueue(r, RedisJobQueueConfig(
+            key_prefix=cfg.jobs_key_prefix,
+            result_ttl_seconds=cfg.jobs_result_ttl_seconds,
+            rate_limit_per_s=cfg.jobs_rate_limit_per_s,
+        ))
+        dispatcher = JobDispatcherService(job_queue, lambda: dict(pm.workers), cfg.cluster_host_id,
+                                          poll_interval_s=cfg.jobs_poll_interval_s)
+        dispatcher.start()
+
+    sim_sync = None
+    if sim_pool is not None:
+        sim_sync = SimPoolSyncService(sim_pool, lambda: dict(pm.workers), interval_s=cfg.sim_pool_sync_interval_s)
+        sim_sync.start()
+
     try:
         pm.run_forever()
     except KeyboardInterrupt:
         logger.info("Received Ctrl+C, shutting down gracefully...")
     finally:
+        if dispatcher is not None:
+            dispatcher.stop()
+        if sim_sync is not None:
+            sim_sync.stop()
         pm.stop()   # nếu bạn có method này    
+        if http_server is not None:
+            http_server.stop()
+        pipeline.stop()
+        tracer.stop()
+        stop_logging()
     # pm.run_forever()
 
 if __name__ == "__main__":
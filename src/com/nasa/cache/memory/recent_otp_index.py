@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.infra.utils.codec_utils import UssdUtils
+
+
+class RecentOtpIndex:
+    """
+    Index in-memory các OTP gần đây theo owner (MSISDN chuẩn hoá, fallback IMEI) -
+    cùng quy ước owner với RedisOtpCache. Giới hạn theo `ttl_s` và `max_entries`.
+
+    `wait` block tới khi có OTP khớp (long-poll); `add` được gọi từ pipeline và đánh thức waiter.
+    """
+
+    def __init__(self, ttl_s: float = 300.0, max_entries: int = 10000):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._cond = threading.Condition()
+        # owner -> deque[(received_ms, added_at, msg)] theo thứ tự thêm vào
+        self._by_owner: Dict[str, Deque[Tuple[int, float, OtpMessage]]] = {}
+        # thứ tự thêm toàn cục để evict O(1): (added_at, owner)
+        self._order: Deque[Tuple[float, str]] = deque()
+
+    @staticmethod
+    def owner_of(msg: OtpMessage) -> str:
+        return UssdUtils.normalize_msisdn(msg.msisdn) or msg.imei or "unknown"
+
+    def add(self, msg: OtpMessage) -> None:
+        owner = self.owner_of(msg)
+        now = time.monotonic()
+        with self._cond:
+            self._by_owner.setdefault(owner, deque()).append(
+                (int(msg.received_at.timestamp() * 1000), now, msg))
+            self._order.append((now, owner))
+            self._evict(now)
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def latest(self, msisdn: str, sender: Optional[str] = None, since_ms: int = 0) -> Optional[OtpMessage]:
+        with self._cond:
+            self._evict(time.monotonic())
+            return self._find(UssdUtils.normalize_msisdn(msisdn) or msisdn, sender, since_ms)
+
+    def wait(self, msisdn: str, sender: Optional[str], since_ms: int, timeout_s: float) -> Optional[OtpMessage]:
+        """OTP mới nhất của MSISDN (và sender nếu có) với received_at >= since_ms; chờ tối đa timeout_s."""
+        owner = UssdUtils.normalize_msisdn(msisdn) or msisdn
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict(now)
+                msg = self._find(owner, sender, since_ms)
+                if msg is not None or now >= deadline:
+                    return msg
+                self._cond.wait(deadline - now)
+
+    def _find(self, owner: str, sender: Optional[str], since_ms: int) -> Optional[OtpMessage]:
+        for received_ms, _, msg in reversed(self._by_owner.get(owner, ())):
+            if received_ms < since_ms:
+                continue
+            if sender is None or msg.sender == sender or msg.sender.strip() == sender:
+                return msg
+        return None
+
+    def _evict(self, now: float) -> None:
+        expire_before = now - self.ttl_s
+        while self._order and (self._order[0][0] < expire_before or len(self._order) > self.max_entries):
+            _, owner = self._order.popleft()
+            entries = self._by_owner.get(owner)
+            if entries:
+                entries.popleft()
+                if not entries:
+                    del self._by_owner[owner]
@@ -0,0 +1,125 @@
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import redis
+
+
+@dataclass(frozen=True)
+class RedisJobQueueConfig:
+    key_prefix: str = "jobs:"
+    job_ttl_seconds: int = 600
+    result_ttl_seconds: int = 3600
+    rate_limit_per_s: int = 5
+
+
+class RedisJobQueue:
+    """
+    Hàng đợi job USSD/AT dùng chung cho cả farm.
+
+    - `{prefix}pending`           -> list job_id chưa xong
+    - `{prefix}job:{id}`          -> JSON job (EX job_ttl)
+    - `{prefix}claim:{id}`        -> hash imei -> host_id (HSETNX: mỗi modem chạy job 1 lần)
+    - `{prefix}result:{id}`       -> hash imei -> JSON kết quả (EX result_ttl)
+    - `{prefix}rate:{epoch_sec}`  -> counter rate limit toàn farm
+    """
+    logger = logging.getLogger(__name__)
+
+    ACTIONS = ("ussd", "at")
+    # task chạy trên serial thread của worker -> giới hạn thời gian chặn đọc SMS
+    MAX_TIMEOUT_S = 30.0
+
+    def __init__(self, client: redis.Redis, cfg: RedisJobQueueConfig):
+        self.client = client
+        self.cfg = cfg
+
+    def _k(self, *parts: str) -> str:
+        return self.cfg.key_prefix + ":".join(parts)
+
+    def submit(self, action: str, command: str, targets: Optional[List[str]] = None,
+               timeout_s: float = 12.0) -> str:
+        """
+        `targets` là list IMEI hoặc MSISDN; None = mọi modem nhận job trước khi job hết hạn.
+        """
+        if action not in self.ACTIONS:
+            raise ValueError(f"unsupported action: {action}")
+        if not 0 < timeout_s <= self.MAX_TIMEOUT_S:
+            raise ValueError(f"timeout_s must be in (0, {self.MAX_TIMEOUT_S:.0f}]: {timeout_s}")
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "action": action,
+            "command": command,
+            "targets": targets,
+            "timeout_s": timeout_s,
+            "created_at": int(time.time()),
+        }
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(self._k("job", job_id), json.dumps(job), ex=self.cfg.job_ttl_seconds)
+        pipe.rpush(self._k("pending"), job_id)
+        pipe.execute()
+        self.logger.info("submit job=%s action=%s command=%s targets=%s",
+                         job_id, action, command, len(targets) if targets else "*")
+        return job_id
+
+    def pending_jobs(self) -> List[dict]:
+        ids = self.client.lrange(self._k("pending"), 0, -1)
+        if not ids:
+            return []
+        values = self.client.mget([self._k("job", i) for i in ids])
+        out = []
+        for job_id, v in zip(ids, values):
+            if v:
+                out.append(json.loads(v))
+            else:
+                # job hết hạn
+                self.client.lrem(self._k("pending"), 0, job_id)
+        return out
+
+    def claimed(self, job_id: str) -> Dict[str, str]:
+        return self.client.hgetall(self._k("claim", job_id))
+
+    def claim(self, job_id: str, imei: str, host_id: str) -> bool:
+        key = self._k("claim", job_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hsetnx(key, imei, host_id)
+        pipe.expire(key, self.cfg.result_ttl_seconds)
+        ok, _ = pipe.execute()
+        return bool(ok)
+
+    def unclaim(self, job_id: str, imei: str) -> None:
+        """Bỏ claim khi không giao được task cho modem, để lần poll sau modem vẫn nhận được job."""
+        self.client.hdel(self._k("claim", job_id), imei)
+
+    def acquire_rate_slot(self) -> bool:
+        if self.cfg.rate_limit_per_s <= 0:
+            return True
+        key = self._k("rate", str(int(time.time())))
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(key)
+        pipe.expire(key, 2)
+        n, _ = pipe.execute()
+        return n <= self.cfg.rate_limit_per_s
+
+    def put_result(self, job: dict, imei: str, result: dict) -> None:
+        key = self._k("result", job["id"])
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(key, imei, json.dumps(result, ensure_ascii=False))
+        pipe.expire(key, self.cfg.result_ttl_seconds)
+        pipe.hlen(key)
+        _, _, done = pipe.execute()
+        targets = job.get("targets")
+        if targets and done >= len(targets):
+            self.client.lrem(self._k("pending"), 0, job["id"])
+            self.logger.info("job done job=%s results=%s", job["id"], done)
+
+    def results(self, job_id: str) -> Dict[str, dict]:
+        raw = self.client.hgetall(self._k("result", job_id))
+        return {imei: json.loads(v) for imei, v in raw.items()}
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        v = self.client.get(self._k("job", job_id))
+        return json.loads(v) if v else None
@@ -0,0 +1,184 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import redis
+
+# KEYS[1] = lease key, ARGV[1] = owner, ARGV[2] = ttl ms
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = lease key, ARGV[1] = owner
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class RedisModemRegistryConfig:
+    host_id: str
+    node: str
+    key_prefix: str = "farm:"
+    lease_ttl_seconds: float = 10.0
+
+
+class RedisModemRegistry:
+    """
+    Registry dùng chung cho cả farm (nhiều host chạy PortManager).
+
+    - `{prefix}lease:{imei}`         -> host_id đang giữ modem (PX ttl, renew định kỳ)
+    - `{prefix}port:{node}:{port}`   -> host_id đang dùng port trên máy `node`
+                                        (nhiều process trên cùng 1 máy không probe chồng lên nhau)
+    - `{prefix}host:{host_id}`       -> heartbeat JSON của host (EX ttl)
+    - `{prefix}modem:{imei}`         -> hash imei/host/node/port/msisdn/health/updated_at (EX ttl)
+    - `{prefix}hosts`, `{prefix}modems` -> set index để liệt kê
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, client: redis.Redis, cfg: RedisModemRegistryConfig):
+        self.client = client
+        self.cfg = cfg
+        self._ttl_ms = int(cfg.lease_ttl_seconds * 1000)
+        self._renew = client.register_script(_RENEW_LUA)
+        self._release = client.register_script(_RELEASE_LUA)
+
+    @property
+    def host_id(self) -> str:
+        return self.cfg.host_id
+
+    def _lease_key(self, imei: str) -> str:
+        return f"{self.cfg.key_prefix}lease:{imei}"
+
+    def _port_key(self, port: str) -> str:
+        return f"{self.cfg.key_prefix}port:{self.cfg.node}:{port}"
+
+    def _host_key(self, host_id: str) -> str:
+        return f"{self.cfg.key_prefix}host:{host_id}"
+
+    def _modem_key(self, imei: str) -> str:
+        return f"{self.cfg.key_prefix}modem:{imei}"
+
+    # ---- leases ----
+
+    def _acquire(self, key: str) -> bool:
+        try:
+            if self.client.set(key, self.host_id, nx=True, px=self._ttl_ms):
+                return True
+            # re-entrant: lease đã là của mình thì chỉ renew
+            return bool(self._renew(keys=[key], args=[self.host_id, self._ttl_ms]))
+        except Exception as e:
+            self.logger.warning("acquire key=%s err=%s", key, e)
+            return False
+
+    def _release_key(self, key: str) -> bool:
+        """True nếu đã xoá lease của chính host này."""
+        try:
+            return bool(self._release(keys=[key], args=[self.host_id]))
+        except Exception as e:
+            self.logger.warning("release key=%s err=%s", key, e)
+            return False
+
+    def acquire_port(self, port: str) -> bool:
+        return self._acquire(self._port_key(port))
+
+    def release_port(self, port: str) -> None:
+        self._release_key(self._port_key(port))
+
+    def acquire_imei(self, imei: str) -> bool:
+        return self._acquire(self._lease_key(imei))
+
+    def release_imei(self, imei: str) -> None:
+        # lease đã thuộc host khác (takeover) -> không đụng vào record của owner mới
+        if not self._release_key(self._lease_key(imei)):
+            return
+        try:
+            self.client.hset(self._modem_key(imei), mapping={"health": "released", "updated_at": int(time.time())})
+        except Exception as e:
+            self.logger.warning("release imei=%s err=%s", imei, e)
+
+    def lease_owner(self, imei: str) -> Optional[str]:
+        try:
+            return self.client.get(self._lease_key(imei))
+        except Exception:
+            return None
+
+    def renew(self, imei: str, port: str) -> Optional[bool]:
+        """
+        Renew lease IMEI + port claim trong 1 round trip.
+        True = còn lease, False = đã mất lease, None = lỗi Redis (chưa biết, caller tự giới hạn thời gian).
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._renew(keys=[self._lease_key(imei)], args=[self.host_id, self._ttl_ms], client=pipe)
+            self._renew(keys=[self._port_key(port)], args=[self.host_id, self._ttl_ms], client=pipe)
+            lease_ok, _ = pipe.execute()
+            return bool(lease_ok)
+        except Exception as e:
+            self.logger.warning("renew imei=%s err=%s", imei, e)
+            return None
+
+    # ---- registry ----
+
+    def heartbeat(self, modems: List[Dict[str, str]]) -> None:
+        """Publish heartbeat của host + record của từng modem mà host đang giữ."""
+        ttl_s = max(1, int(self.cfg.lease_ttl_seconds * 3))
+        now = int(time.time())
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self._host_key(self.host_id),
+                 json.dumps({"host": self.host_id, "node": self.cfg.node, "workers": len(modems), "updated_at": now}),
+                 ex=ttl_s)
+        pipe.sadd(f"{self.cfg.key_prefix}hosts", self.host_id)
+        for m in modems:
+            key = self._modem_key(m["imei"])
+            pipe.hset(key, mapping={**m, "host": self.host_id, "node": self.cfg.node, "updated_at": now})
+            pipe.expire(key, ttl_s)
+            pipe.sadd(f"{self.cfg.key_prefix}modems", m["imei"])
+        try:
+            pipe.execute()
+        except Exception as e:
+            self.logger.warning("heartbeat host=%s err=%s", self.host_id, e)
+
+    def list_hosts(self) -> List[dict]:
+        ids = sorted(self.client.smembers(f"{self.cfg.key_prefix}hosts"))
+        if not ids:
+            return []
+        values = self.client.mget([self._host_key(h) for h in ids])
+        out, gone = [], []
+        for host_id, v in zip(ids, values):
+            if v:
+                out.append(json.loads(v))
+            else:
+                gone.append(host_id)
+        if gone:
+            self.client.srem(f"{self.cfg.key_prefix}hosts", *gone)
+        return out
+
+    def list_modems(self) -> List[dict]:
+        imeis = sorted(self.client.smembers(f"{self.cfg.key_prefix}modems"))
+        if not imeis:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for imei in imeis:
+            pipe.hgetall(self._modem_key(imei))
+            pipe.get(self._lease_key(imei))
+        res = pipe.execute()
+        out, gone = [], []
+        for i, imei in enumerate(imeis):
+            rec, owner = res[2 * i], res[2 * i + 1]
+            if not rec:
+                gone.append(imei)
+                continue
+            rec["leased_by"] = owner or ""
+            out.append(rec)
+        if gone:
+            self.client.srem(f"{self.cfg.key_prefix}modems", *gone)
+        return out
@@ -1,39 +1,173 @@
-import json
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import time
 import redis
 import logging
+
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.infra.utils.codec_utils import UssdUtils
+from com.nasa.infra.utils.otp_codec import OtpCodec
+
+# KEYS: latest, idx, ts:{owner}, legacy, ts:legacy  (2 key cuối chỉ dùng khi ARGV[6] == '1')
+# ARGV: value, received_ms, ttl_s, cutoff_ms, sender, legacy
+# return 1 = đã ghi key latest, 0 = đã có OTP mới hơn (chỉ ghi vào index)
+_PUT_LUA = """
+local value, ts, ttl, sender = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[5]
+local function put_latest(key, ts_key)
+    local cur = redis.call('HGET', ts_key, sender)
+    -- SMS tới trễ (retry, nhiều port) không được đè OTP mới hơn còn hạn
+    if cur and tonumber(cur) > ts and redis.call('EXISTS', key) == 1 then
+        return 0
+    end
+    redis.call('SET', key, value, 'EX', ttl)
+    redis.call('HSET', ts_key, sender, ts)
+    redis.call('EXPIRE', ts_key, ttl)
+    return 1
+end
+local written = put_latest(KEYS[1], KEYS[3])
+redis.call('ZADD', KEYS[2], ts, value)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[4])
+redis.call('EXPIRE', KEYS[2], ttl)
+if ARGV[6] == '1' then
+    put_latest(KEYS[4], KEYS[5])
+end
+return written
+"""
+
 @dataclass(frozen=True)
 class RedisOtpCacheConfig:
     ttl_seconds: int
     key_prefix: str
+    value_format: str = "json"
+    legacy_sender_key: bool = True
 
 class RedisOtpCache:
+    """
+    Keyspace (owner = MSISDN của SIM nhận, fallback IMEI nếu chưa biết MSISDN):
+    - `{prefix}{owner}:{sender}` -> OTP mới nhất của sender gửi tới SIM đó (EX ttl)
+    - `{prefix}idx:{owner}`      -> sorted set, score = received_at (epoch ms), member = value đã encode
+    - `{prefix}{sender}`         -> key cũ (chỉ theo sender), giữ nếu `legacy_sender_key`
+    - `{prefix}ts:{owner}`, `{prefix}ts:legacy` -> hash sender -> received_at (ms) của value trong key latest
+    Tất cả được ghi trong 1 Lua script (atomic); key latest chỉ bị ghi đè bởi OTP có received_at mới hơn.
+    Script dùng nhiều key của các owner/sender khác nhau -> chỉ dùng với Redis single instance.
+    """
     logger = logging.getLogger(__name__)
     def __init__(self, client: redis.Redis, cfg: RedisOtpCacheConfig):
+        # client nên tạo với decode_responses=False: value có thể là binary (format "bin")
         self.client = client
         self.cfg = cfg
+        self.codec = OtpCodec(cfg.value_format)
+        self._put = client.register_script(_PUT_LUA)
 
-    def put(self, sender: str, payload: dict) -> None:
+    def put(self, msg: OtpMessage) -> bool:
+        """False nếu ghi Redis lỗi (đã log)."""
+        key = None
         try:
-            key = self.buildRedisKey(sender=sender, payload=payload)
-            self.client.setex(key, self.cfg.ttl_seconds, json.dumps(payload, ensure_ascii=False))
-            self.logger.info("put: %s", key)
-            self.logger.debug("put payload key=%s payload=%s",key,json.dumps(payload, ensure_ascii=False))
+            owner = self._owner(msg)
+            key = self.buildRedisKey(sender=msg.sender, msg=msg)
+            value = self.codec.encode(msg)
+            received_ms = int(msg.received_at.timestamp() * 1000)
+            cutoff_ms = int(time.time() * 1000) - self.cfg.ttl_seconds * 1000
+
+            written = self._put(
+                keys=[key, self._index_key(owner), self._ts_key(owner),
+                      self._legacy_key(msg.sender), self._ts_key("legacy")],
+                args=[value, received_ms, self.cfg.ttl_seconds, cutoff_ms, msg.sender or "unknown",
+                      1 if self.cfg.legacy_sender_key else 0])
+
+            if written:
+                self.logger.info("put: %s", key)
+            else:
+                self.logger.info("put: %s older than latest, indexed only", key)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("put payload key=%s bytes=%s msg=%s", key, len(value), msg)
+            return True
         except Exception as e:
             self.logger.warning("put key=%s err=%s", key, e)
+            return False
 
 
-    def get(self, sender: str) -> Optional[dict]:
+    def get(self, sender: str) -> Optional[OtpMessage]:
+        """Key cũ theo sender (cần `legacy_sender_key`)."""
         try:
-            key = f"{self.cfg.key_prefix}{sender or 'unknown'}"
-            v = self.client.get(key)
+            v = self.client.get(self._legacy_key(sender))
             if not v:
                 return None
-            return json.loads(v)
+            return OtpCodec.decode(v)
         except Exception:
             return None
-    
-    def buildRedisKey(self, sender: str, payload: dict) -> None:
-        key = f"{self.cfg.key_prefix}{sender or 'unknown'}"
-        return key
\ No newline at end of file
+
+    def get_latest(self, msisdn: str, sender: str) -> Optional[OtpMessage]:
+        return self.mget_latest([(msisdn, sender)])[0]
+
+    def mget_latest(self, pairs: Iterable[Tuple[str, str]]) -> List[Optional[OtpMessage]]:
+        """OTP mới nhất cho nhiều cặp (msisdn, sender) trong 1 MGET."""
+        keys = [self._key(UssdUtils.normalize_msisdn(m), s) for m, s in pairs]
+        if not keys:
+            return []
+        return [self._decode(v) for v in self.client.mget(keys)]
+
+    def latest_for_msisdns(self, msisdns: Iterable[str]) -> Dict[str, Optional[OtpMessage]]:
+        """OTP mới nhất (mọi sender) của từng MSISDN, pipelined 1 round trip."""
+        msisdns = list(msisdns)
+        pipe = self.client.pipeline(transaction=False)
+        for m in msisdns:
+            pipe.zrevrange(self._index_key(UssdUtils.normalize_msisdn(m)), 0, 0)
+        out = {}
+        for m, members in zip(msisdns, pipe.execute()):
+            out[m] = self._decode(members[0]) if members else None
+        return out
+
+    def since(self, msisdn: str, since: Union[datetime, int], sender: Optional[str] = None,
+              limit: Optional[int] = None) -> List[OtpMessage]:
+        """
+        OTP của MSISDN có received_at >= `since` (datetime hoặc epoch ms), cũ -> mới, tối đa `limit` OTP.
+        Sender nằm trong value đã encode nên lọc theo `sender` ở client: khi đó index được đọc hết
+        (đã bị giới hạn bởi ttl) và `limit` áp dụng sau khi lọc.
+        """
+        since_ms = int(since.timestamp() * 1000) if isinstance(since, datetime) else int(since)
+        server_limit = limit if limit and sender is None else None
+        members = self.client.zrangebyscore(
+            self._index_key(UssdUtils.normalize_msisdn(msisdn)), since_ms, "+inf",
+            start=0 if server_limit else None, num=server_limit)
+        out = []
+        for v in members:
+            msg = self._decode(v)
+            if msg is not None and (sender is None or msg.sender == sender):
+                out.append(msg)
+                if limit and len(out) >= limit:
+                    break
+        return out
+
+    def buildRedisKey(self, sender: str, msg: Optional[OtpMessage] = None) -> str:
+        if msg is None:
+            return self._legacy_key(sender)
+        return self._key(self._owner(msg), sender)
+
+    # ---- helpers ----
+
+    @staticmethod
+    def _owner(msg: OtpMessage) -> str:
+        return UssdUtils.normalize_msisdn(msg.msisdn) or msg.imei or "unknown"
+
+    def _key(self, owner: str, sender: str) -> str:
+        return f"{self.cfg.key_prefix}{owner or 'unknown'}:{sender or 'unknown'}"
+
+    def _index_key(self, owner: str) -> str:
+        return f"{self.cfg.key_prefix}idx:{owner or 'unknown'}"
+
+    def _ts_key(self, owner: str) -> str:
+        return f"{self.cfg.key_prefix}ts:{owner or 'unknown'}"
+
+    def _legacy_key(self, sender: str) -> str:
+        return f"{self.cfg.key_prefix}{sender or 'unknown'}"
+
+    def _decode(self, v) -> Optional[OtpMessage]:
+        if not v:
+            return None
+        try:
+            return OtpCodec.decode(v)
+        except Exception as e:
+            self.logger.warning("decode failed err=%s", e)
+            return None
@@ -1,4 +1,4 @@
 import redis
 
-def create_redis(url: str) -> redis.Redis:
-    return redis.Redis.from_url(url, decode_responses=True)
+def create_redis(url: str, decode_responses: bool = True) -> redis.Redis:
+    return redis.Redis.from_url(url, decode_responses=decode_responses)
@@ -0,0 +1,230 @@
+import logging
+import math
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+import redis
+
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.entities.sim_lease import SimLease
+from com.nasa.infra.utils.codec_utils import UssdUtils
+
+# Các script dựng key lease/cooldown từ prefix bên trong Lua -> chỉ dùng với Redis single instance
+# (không Redis Cluster). Thời gian lấy từ TIME của Redis nên các host không cần đồng bộ đồng hồ.
+_COMMON_LUA = """
+local function now_ms()
+    local t = redis.call('TIME')
+    return tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+end
+local function score_of(uses_key, m, strategy, now)
+    if strategy == 'least_loaded' then
+        return tonumber(redis.call('HGET', uses_key, m) or '0')
+    end
+    return now
+end
+local function is_alive(alive_key, m, now)
+    return tonumber(redis.call('ZSCORE', alive_key, m) or '0') > now
+end
+"""
+
+# KEYS: free, leased, alive, uses, cool:{sender}
+# ARGV: prefix, strategy, lease_ttl_ms, max_scan, sender, consumer, lease_id
+_LEASE_LUA = _COMMON_LUA + """
+local now = now_ms()
+local prefix, strategy = ARGV[1], ARGV[2]
+local ttl, max_scan = tonumber(ARGV[3]), tonumber(ARGV[4])
+
+-- lease hết hạn: trả SIM về pool (giới hạn max_scan mỗi lần gọi để giữ O(log n))
+for _, m in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, max_scan)) do
+    redis.call('ZREM', KEYS[2], m)
+    redis.call('DEL', prefix .. 'lease:' .. m)
+    if is_alive(KEYS[3], m, now) then
+        redis.call('ZADD', KEYS[1], score_of(KEYS[4], m, strategy, now), m)
+    end
+end
+
+-- SIM cooldown với sender có thể nằm ở đầu `free` (nhất là least_loaded) -> nới cửa sổ quét thêm
+-- đúng số SIM đang cooldown để vẫn xét đủ max_scan SIM không cooldown
+local cooling = 0
+if ARGV[5] ~= '' then
+    redis.call('ZREMRANGEBYSCORE', KEYS[5], '-inf', now)
+    cooling = redis.call('ZCARD', KEYS[5])
+end
+for _, m in ipairs(redis.call('ZRANGE', KEYS[1], 0, max_scan + cooling - 1)) do
+    if not is_alive(KEYS[3], m, now) then
+        redis.call('ZREM', KEYS[1], m)
+    elseif ARGV[5] == '' or tonumber(redis.call('ZSCORE', KEYS[5], m) or '0') <= now then
+        local lease_key = prefix .. 'lease:' .. m
+        redis.call('ZREM', KEYS[1], m)
+        redis.call('ZADD', KEYS[2], now + ttl, m)
+        redis.call('HSET', lease_key, 'lease_id', ARGV[7], 'sender', ARGV[5], 'consumer', ARGV[6],
+                   'leased_at', now, 'expires_at', now + ttl)
+        redis.call('PEXPIRE', lease_key, ttl)
+        redis.call('HINCRBY', KEYS[4], m, 1)
+        return {m, now + ttl}
+    end
+end
+return false
+"""
+
+# KEYS: free, leased, alive, uses, lease:{msisdn}
+# ARGV: prefix, strategy, msisdn, lease_id ('' = không check), match_sender ('' = không check), cooldown_ms
+# return 1 = released, 0 = không có lease, -1 = lease_id/sender không khớp
+_RELEASE_LUA = _COMMON_LUA + """
+local now = now_ms()
+local prefix, strategy, m = ARGV[1], ARGV[2], ARGV[3]
+local lease = redis.call('HMGET', KEYS[5], 'lease_id', 'sender')
+if not lease[1] then
+    return 0
+end
+if ARGV[4] ~= '' and lease[1] ~= ARGV[4] then
+    return -1
+end
+local sender = lease[2] or ''
+if ARGV[5] ~= '' and sender ~= '' and sender ~= ARGV[5] then
+    return -1
+end
+
+redis.call('DEL', KEYS[5])
+redis.call('ZREM', KEYS[2], m)
+local cooldown = tonumber(ARGV[6])
+if sender ~= '' and cooldown > 0 then
+    local cool_key = prefix .. 'cool:' .. sender
+    redis.call('ZADD', cool_key, now + cooldown, m)
+    redis.call('ZREMRANGEBYSCORE', cool_key, '-inf', now)
+    redis.call('PEXPIRE', cool_key, cooldown)
+end
+if is_alive(KEYS[3], m, now) then
+    redis.call('ZADD', KEYS[1], score_of(KEYS[4], m, strategy, now), m)
+end
+return 1
+"""
+
+# KEYS: free, leased, alive, uses
+# ARGV: strategy, alive_ttl_ms, n_alive, <n_alive msisdn sống>, <msisdn chết...>
+_SYNC_LUA = _COMMON_LUA + """
+local now = now_ms()
+local strategy, alive_ttl, n_alive = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+for i = 4, 3 + n_alive do
+    local m = ARGV[i]
+    redis.call('ZADD', KEYS[3], now + alive_ttl, m)
+    if not redis.call('ZSCORE', KEYS[2], m) and not redis.call('ZSCORE', KEYS[1], m) then
+        redis.call('ZADD', KEYS[1], score_of(KEYS[4], m, strategy, now), m)
+    end
+end
+for i = 4 + n_alive, #ARGV do
+    redis.call('ZREM', KEYS[1], ARGV[i])
+    redis.call('ZREM', KEYS[3], ARGV[i])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+@dataclass(frozen=True)
+class RedisSimPoolConfig:
+    key_prefix: str = "sim:"
+    strategy: str = "lru"           # "lru" | "least_loaded"
+    lease_ttl_seconds: float = 120.0
+    cooldown_seconds: float = 300.0
+    alive_ttl_seconds: float = 30.0
+    max_scan: int = 32
+
+
+class RedisSimPool:
+    """
+    Cấp MSISDN nhận OTP cho consumer, dùng chung cho cả farm.
+
+    - `{prefix}free`          -> zset SIM rảnh; score = lần dùng cuối (lru) hoặc số lần đã lease (least_loaded)
+    - `{prefix}leased`        -> zset SIM đang lease, score = hết hạn (epoch ms)
+    - `{prefix}lease:{msisdn}` -> hash lease_id/sender/consumer/leased_at/expires_at (PX lease ttl)
+    - `{prefix}alive`         -> zset SIM có worker khoẻ, score = alive tới (epoch ms), do `sync` gia hạn
+    - `{prefix}cool:{sender}` -> zset SIM vừa nhận OTP của sender, score = hết cooldown
+    - `{prefix}uses`          -> hash msisdn -> số lần đã lease
+
+    `lease` là 1 Lua script: trả lease hết hạn về pool rồi xét `max_scan` + (số SIM đang cooldown với
+    sender) SIM đầu zset `free`, bỏ SIM chết / đang cooldown -> O(log n + max_scan + cooldown) theo số
+    SIM, atomic dưới nhiều client đồng thời. SIM chết chỉ bị gỡ dần (tối đa cửa sổ quét mỗi lần), nên
+    nếu cả cửa sổ toàn SIM chết thì lần lease đó trả None dù cuối zset vẫn còn SIM khoẻ.
+    """
+    logger = logging.getLogger(__name__)
+
+    STRATEGIES = ("lru", "least_loaded")
+
+    def __init__(self, client: redis.Redis, cfg: RedisSimPoolConfig):
+        if cfg.strategy not in self.STRATEGIES:
+            raise ValueError(f"unsupported SIM pool strategy: {cfg.strategy}")
+        self.client = client
+        self.cfg = cfg
+        self._lease = client.register_script(_LEASE_LUA)
+        self._release = client.register_script(_RELEASE_LUA)
+        self._sync = client.register_script(_SYNC_LUA)
+
+    def _k(self, *parts: str) -> str:
+        return self.cfg.key_prefix + ":".join(parts)
+
+    def _base_keys(self):
+        return [self._k("free"), self._k("leased"), self._k("alive"), self._k("uses")]
+
+    @staticmethod
+    def _sender(sender: Optional[str]) -> str:
+        return (sender or "").strip().lower()
+
+    def lease(self, sender: str = "", consumer: str = "", ttl_s: Optional[float] = None) -> Optional[SimLease]:
+        """Lease 1 SIM khoẻ, rảnh, không cooldown với `sender`. None = hết SIM."""
+        if ttl_s is not None and not 0 < ttl_s < math.inf:
+            raise ValueError(f"ttl must be > 0: {ttl_s}")
+        sender = self._sender(sender)
+        ttl_ms = int((ttl_s or self.cfg.lease_ttl_seconds) * 1000)
+        lease_id = uuid.uuid4().hex
+        res = self._lease(
+            keys=self._base_keys() + [self._k("cool", sender)],
+            args=[self.cfg.key_prefix, self.cfg.strategy, ttl_ms, self.cfg.max_scan, sender, consumer, lease_id])
+        if not res:
+            self.logger.warning("lease: no sim available sender=%s consumer=%s", sender, consumer)
+            return None
+        msisdn, expires_at_ms = res
+        self.logger.info("lease msisdn=%s sender=%s consumer=%s lease=%s", msisdn, sender, consumer, lease_id)
+        return SimLease(msisdn=msisdn, lease_id=lease_id, sender=sender, expires_at_ms=int(expires_at_ms))
+
+    def release(self, msisdn: str, lease_id: str = "", sender: str = "") -> int:
+        """
+        1 = đã trả SIM về pool, 0 = SIM không có lease, -1 = `lease_id`/`sender` không khớp lease hiện tại.
+        Lease có sender thì SIM vào cooldown với sender đó `cooldown_seconds`.
+        """
+        msisdn = UssdUtils.normalize_msisdn(msisdn)
+        return int(self._release(
+            keys=self._base_keys() + [self._k("lease", msisdn)],
+            args=[self.cfg.key_prefix, self.cfg.strategy, msisdn, lease_id, self._sender(sender),
+                  int(self.cfg.cooldown_seconds * 1000)]))
+
+    def release_on_otp(self, msg: OtpMessage) -> None:
+        """Listener của SmsPipeline: OTP của đúng sender (hoặc lease không ghi sender) tới -> auto release."""
+        msisdn = UssdUtils.normalize_msisdn(msg.msisdn)
+        if not msisdn:
+            return
+        try:
+            if self.release(msisdn, sender=msg.sender) == 1:
+                self.logger.info("auto release msisdn=%s sender=%s", msisdn, msg.sender)
+        except Exception as e:
+            self.logger.warning("auto release msisdn=%s err=%s", msisdn, e)
+
+    def sync(self, alive: Iterable[str], dead: Iterable[str] = ()) -> int:
+        """Gia hạn SIM có worker khoẻ (thêm vào pool nếu mới), gỡ SIM chết. Trả về số SIM rảnh."""
+        alive = [m for m in (UssdUtils.normalize_msisdn(x) for x in alive) if m]
+        dead = [m for m in (UssdUtils.normalize_msisdn(x) for x in dead) if m]
+        return int(self._sync(
+            keys=self._base_keys(),
+            args=[self.cfg.strategy, int(self.cfg.alive_ttl_seconds * 1000), len(alive), *alive, *dead]))
+
+    def get_lease(self, msisdn: str) -> Dict[str, str]:
+        return self.client.hgetall(self._k("lease", UssdUtils.normalize_msisdn(msisdn)))
+
+    def stats(self) -> Dict[str, int]:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard(self._k("free"))
+        pipe.zcard(self._k("leased"))
+        pipe.zcard(self._k("alive"))
+        free, leased, alive = pipe.execute()
+        return {"free": free, "leased": leased, "alive": alive}
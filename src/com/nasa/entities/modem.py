@@ -1,6 +1,13 @@
 from dataclasses import dataclass
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ModemInfo:
     imei: str
     port: str
+
+@dataclass(frozen=True, slots=True)
+class PortProfile:
+    """Thông tin đã biết về modem trên 1 port, dùng lại ở lần probe/spawn sau."""
+    port: str
+    imei: str
+    baudrate: int
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OtpMessage:
     otp: str
     sender: str
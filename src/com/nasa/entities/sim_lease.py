@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True, slots=True)
+class SimLease:
+    """1 MSISDN đang được cấp cho consumer chờ OTP."""
+    msisdn: str
+    lease_id: str
+    sender: str
+    expires_at_ms: int
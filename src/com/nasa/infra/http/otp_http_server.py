@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.infra.utils.otp_codec import OtpCodec
+from com.nasa.cache.memory.recent_otp_index import RecentOtpIndex
+from com.nasa.cache.redis.sim_pool import RedisSimPool
+
+
+@dataclass(frozen=True)
+class OtpHttpConfig:
+    host: str = "127.0.0.1"
+    port: int = 8080
+    max_wait_s: float = 60.0
+
+
+class OtpHttpServer:
+    """
+    HTTP API đọc OTP từ RecentOtpIndex (Redis vẫn là bản lưu chính):
+
+    - `GET /otp/wait?msisdn=..&sender=..&timeout=30&since=<epoch ms>`
+        long-poll: trả 200 + JSON ngay khi có OTP khớp, 204 nếu hết timeout.
+        `since` mặc định = lúc nhận request (chỉ chờ OTP mới).
+    - `GET /otp/latest?msisdn=..&sender=..` -> 200 hoặc 404
+    - `GET /health`
+
+    Khi có `sim_pool`:
+    - `POST /sim/lease?sender=..&consumer=..&ttl=<giây>` -> 200 {msisdn, lease_id, expires_at} hoặc 503 hết SIM
+    - `POST /sim/release?msisdn=..&lease_id=..` -> 200, 404 (không có lease) hoặc 409 (lease_id không khớp);
+      `lease_id` bắt buộc để consumer không trả nhầm SIM đã được cấp cho consumer khác
+    - `GET /sim/stats`
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, cfg: OtpHttpConfig, index: RecentOtpIndex, sim_pool: Optional[RedisSimPool] = None):
+        self.cfg = cfg
+        self.index = index
+        self.sim_pool = sim_pool
+        self._httpd = ThreadingHTTPServer((cfg.host, cfg.port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="otp-http", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+        self.logger.info("listening on %s:%s", self.cfg.host, self.port)
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+        codec = OtpCodec("json")
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                server.logger.debug("%s " + fmt, self.address_string(), *args)
+
+            def _send(self, status: int, body: bytes = b"") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def _send_msg(self, msg: Optional[OtpMessage], empty_status: int) -> None:
+                if msg is None:
+                    self._send(empty_status)
+                else:
+                    self._send(200, codec.encode(msg))
+
+            def _send_json(self, status: int, obj) -> None:
+                self._send(status, json.dumps(obj).encode())
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                pool = server.sim_pool
+                if pool is None or url.path not in ("/sim/lease", "/sim/release"):
+                    self._send(404, b'{"error":"not found"}')
+                    return
+                try:
+                    if url.path == "/sim/lease":
+                        ttl_s = float(q["ttl"]) if q.get("ttl") else None
+                        lease = pool.lease(q.get("sender", ""), q.get("consumer", ""), ttl_s)
+                        if lease is None:
+                            self._send(503, b'{"error":"no sim available"}')
+                            return
+                        self._send_json(200, {"msisdn": lease.msisdn, "lease_id": lease.lease_id,
+                                              "sender": lease.sender, "expires_at": lease.expires_at_ms})
+                        return
+
+                    msisdn = q.get("msisdn", "").strip()
+                    lease_id = q.get("lease_id", "").strip()
+                    if not msisdn or not lease_id:
+                        self._send(400, b'{"error":"msisdn and lease_id are required"}')
+                        return
+                    released = pool.release(msisdn, lease_id)
+                    self._send_json({1: 200, 0: 404, -1: 409}[released], {"released": released == 1})
+                except ValueError as e:
+                    self._send_json(400, {"error": str(e)})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    if url.path == "/health":
+                        self._send(200, json.dumps({"status": "ok", "indexed": len(server.index)}).encode())
+                        return
+                    if url.path == "/sim/stats" and server.sim_pool is not None:
+                        self._send_json(200, server.sim_pool.stats())
+                        return
+                    if url.path not in ("/otp/wait", "/otp/latest"):
+                        self._send(404, b'{"error":"not found"}')
+                        return
+                    msisdn = q.get("msisdn", "").strip()
+                    if not msisdn:
+                        self._send(400, b'{"error":"msisdn is required"}')
+                        return
+                    sender = q.get("sender") or None
+
+                    if url.path == "/otp/latest":
+                        self._send_msg(server.index.latest(msisdn, sender, int(q.get("since", 0))), 404)
+                        return
+
+                    timeout_s = min(float(q.get("timeout", server.cfg.max_wait_s)), server.cfg.max_wait_s)
+                    since_ms = int(q["since"]) if "since" in q else int(time.time() * 1000)
+                    self._send_msg(server.index.wait(msisdn, sender, since_ms, timeout_s), 204)
+                except ValueError as e:
+                    self._send(400, json.dumps({"error": str(e)}).encode())
+
+        return Handler
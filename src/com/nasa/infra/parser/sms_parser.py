@@ -1,6 +1,6 @@
 import logging
 import re
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
 from com.nasa.entities.sms import Sms
@@ -17,6 +17,8 @@ CMGR_HEADER_RE = re.compile(
     r'"(?P<time>[^"]+)"'
 )
 
+SMSC_TS_RE = re.compile(r"^(\d{2})/(\d{2})/(\d{2}),(\d{2}):(\d{2}):(\d{2})([+-]\d{1,2})?$")
+
 
 def parse_cmgl_text(resp: str) -> List[Sms]:
     lines = resp.splitlines()
@@ -57,7 +59,7 @@ def parse_cmgr_text(resp: str, index: int) -> Optional[Sms]:
         return None
 
     try:
-        log.info("parse sms")
+        log.debug("parse sms idx=%s", index)
         lines = [l.strip() for l in resp.splitlines() if l.strip()]
         if len(lines) < 2:
             return None
@@ -88,12 +90,28 @@ def parse_cmgr_text(resp: str, index: int) -> Optional[Sms]:
 
     except Exception as e:
         log.error(
-            "CMGR parse failed idx=%s resp=%r",
+            "CMGR parse failed idx=%s resp=%r err=%s",
             index, resp, e
         )
         return None
 
 
+def parse_smsc_timestamp(s: str) -> Optional[datetime]:
+    """
+    Parse SMSC timestamp dạng `yy/MM/dd,hh:mm:ss±zz` (zz = số phần tư giờ so với UTC).
+    Trả về datetime có timezone, None nếu không parse được.
+    """
+    m = SMSC_TS_RE.match((s or "").strip())
+    if not m:
+        return None
+    yy, mo, dd, hh, mi, ss, tz = m.groups()
+    try:
+        tzinfo = timezone(timedelta(minutes=15 * int(tz))) if tz else timezone.utc
+        return datetime(2000 + int(yy), int(mo), int(dd), int(hh), int(mi), int(ss), tzinfo=tzinfo)
+    except ValueError:
+        return None
+
+
 def decode_ucs2_if_needed(s: str) -> str:
     if s and all(c in "0123456789ABCDEFabcdef" for c in s):
         try:
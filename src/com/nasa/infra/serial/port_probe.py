@@ -1,12 +1,16 @@
+import logging
 import re
 import time
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Optional, List, Sequence
 
 import serial
 from serial.tools import list_ports
 
 IMEI_RE = re.compile(r"\b(\d{14,17})\b")
+IPR_RE = re.compile(r"\+IPR:\s*(.*)", re.IGNORECASE)
+
+log = logging.getLogger(__name__)
 
 @dataclass(frozen=True)
 class ProbeConfig:
@@ -95,3 +99,95 @@ def probe_imei(port: str, cfg: ProbeConfig) -> Optional[str]:
             ser.close()
         except Exception:
             pass
+
+
+def parse_ipr_rates(resp: str, candidates: Sequence[int]) -> List[int]:
+    """
+    Parse `AT+IPR=?` -> các rate trong `candidates` mà modem hỗ trợ, giảm dần.
+    Hỗ trợ dạng list `+IPR: (0,300,...,921600),(...)` và dạng range `+IPR: (300-3000000)`.
+    """
+    m = IPR_RE.search(resp or "")
+    if not m:
+        return []
+    listed = set()
+    ranges = []
+    for group in re.findall(r"\(([^)]*)\)", m.group(1)):
+        for part in group.split(","):
+            part = part.strip()
+            if "-" in part:
+                lo, _, hi = part.partition("-")
+                if lo.strip().isdigit() and hi.strip().isdigit():
+                    ranges.append((int(lo), int(hi)))
+            elif part.isdigit():
+                listed.add(int(part))
+    return sorted((r for r in candidates if r in listed or any(lo <= r <= hi for lo, hi in ranges)), reverse=True)
+
+
+def _echo_ok(port: str, baudrate: int, cfg: ProbeConfig, rounds: int = 3) -> bool:
+    try:
+        ser = serial.Serial(port, baudrate, timeout=cfg.timeout_seconds)
+    except Exception:
+        return False
+    try:
+        try:
+            ser.reset_input_buffer()
+        except Exception:
+            pass
+        return all("OK" in _send(ser, "AT", cfg.max_wait_seconds) for _ in range(rounds))
+    finally:
+        try:
+            ser.close()
+        except Exception:
+            pass
+
+
+def _switch(port: str, from_baud: int, to_baud: int, cfg: ProbeConfig) -> None:
+    """Gửi AT+IPR=<to_baud> ở tốc độ from_baud (best effort, modem có thể đổi rate trước khi kịp trả OK)."""
+    try:
+        ser = serial.Serial(port, from_baud, timeout=cfg.timeout_seconds)
+    except Exception:
+        return
+    try:
+        _send(ser, f"AT+IPR={to_baud}", cfg.max_wait_seconds)
+    finally:
+        try:
+            ser.close()
+        except Exception:
+            pass
+    time.sleep(0.2)
+
+
+def negotiate_baudrate(port: str, cfg: ProbeConfig, candidates: Sequence[int]) -> int:
+    """
+    Chạy sau probe (modem đang ở `cfg.baudrate`): hỏi `AT+IPR=?`, thử lần lượt các rate cao hơn
+    mà modem hỗ trợ, verify bằng echo test. Thất bại thì đưa modem về rate cũ và thử rate kế tiếp.
+    Trả về rate dùng được cao nhất (ít nhất là `cfg.baudrate`).
+    """
+    base = cfg.baudrate
+    try:
+        ser = serial.Serial(port, base, timeout=cfg.timeout_seconds)
+    except Exception:
+        return base
+    try:
+        resp = _send(ser, "AT+IPR=?", cfg.max_wait_seconds)
+    finally:
+        try:
+            ser.close()
+        except Exception:
+            pass
+
+    rates = [r for r in parse_ipr_rates(resp, candidates) if r > base]
+    log.debug("IPR port=%s supported=%s resp=%r", port, rates, resp)
+    for rate in rates:
+        _switch(port, base, rate, cfg)
+        if _echo_ok(port, rate, cfg):
+            log.info("baudrate negotiated port=%s %s -> %s", port, base, rate)
+            return rate
+        log.warning("baudrate verify failed port=%s rate=%s -> fallback %s", port, rate, base)
+        if not _echo_ok(port, base, cfg, rounds=1):
+            # modem đã đổi rate nhưng link không ổn định ở rate đó: đưa về rate cũ
+            _switch(port, rate, base, cfg)
+            if not _echo_ok(port, base, cfg, rounds=1):
+                log.error("modem unreachable after fallback port=%s rate=%s", port, rate)
+                return base
+    return base
@@ -21,8 +21,28 @@ class SerialModem:
         self.cfg = cfg
         self._lock = threading.Lock()
         self.ser = serial.Serial(cfg.port, cfg.baudrate, timeout=cfg.timeout_seconds)
+        # monotonic time của lần cuối modem trả về gì đó hợp lệ (URC, OK, ERROR) - watchdog dùng
+        self.last_rx_at = time.monotonic()
         self.logger.info("Serial opened port=%s baudrate=%s", cfg.port, cfg.baudrate)
 
+    def reopen(self) -> None:
+        """Đóng rồi mở lại port với cùng config (watchdog dùng khi modem không phản hồi)."""
+        with self._lock:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            time.sleep(0.5)
+            self.ser = serial.Serial(self.cfg.port, self.cfg.baudrate, timeout=self.cfg.timeout_seconds)
+        self.logger.info("Serial reopened port=%s baudrate=%s", self.cfg.port, self.cfg.baudrate)
+
+    def cancel_read(self) -> None:
+        """Huỷ `readline` đang block (gọi từ thread khác khi stop worker). Best effort."""
+        try:
+            self.ser.cancel_read()
+        except Exception as e:
+            self.logger.debug("cancel_read failed port=%s err=%s", self.cfg.port, e)
+
     def close(self):
         try:
             self.ser.close()
@@ -35,15 +55,17 @@ class SerialModem:
         time.sleep(0.15)
         return self.ser.read_all().decode(errors="ignore")
 
-    def send(self, cmd: str, max_wait_seconds: float = 2.0) -> str:
+    def send(self, cmd: str, max_wait_seconds: float = 2.0, flush_input: bool = True) -> str:
+        """`flush_input=False`: giữ URC đang nằm trong buffer, caller tự xử lý trong response."""
         with self._lock:
             try:
                 # (optional) clear buffers — best effort, không critical
-                try:
-                    self.ser.reset_input_buffer()
-                    self.ser.reset_output_buffer()
-                except Exception:
-                    pass
+                if flush_input:
+                    try:
+                        self.ser.reset_input_buffer()
+                        self.ser.reset_output_buffer()
+                    except Exception:
+                        pass
 
                 self.logger.debug("AT SEND port=%s cmd=%s", self.cfg.port, cmd)
 
@@ -59,11 +81,13 @@ class SerialModem:
 
                     # thành công
                     if "\nOK" in buf or buf.strip().endswith("OK"):
+                        self.last_rx_at = time.monotonic()
                         self.logger.debug("AT OK port=%s cmd=%s", self.cfg.port, cmd)
                         return buf
 
                     # lỗi modem
                     if "ERROR" in buf or "+CME ERROR" in buf:
+                        self.last_rx_at = time.monotonic()
                         self.logger.warning("AT ERROR port=%s cmd=%s resp=%s", self.cfg.port, cmd, buf.strip())
                         return buf
 
@@ -83,17 +107,18 @@ class SerialModem:
             self.logger.exception("USSD FAILED port=%s code=%s err=%s", self.cfg.port, code, e)
             return ""
 
-    def send_ussd_wait(self, code: str, dcs: int = 15, timeout_s: float = 12.0) -> str:
+    def send_ussd_wait(self, code: str, dcs: int = 15, timeout_s: float = 12.0, flush_input: bool = True) -> str:
         """
         Gửi USSD và CHỜ đến khi thấy +CUSD: ... (vì +CUSD đến sau OK).
-        Trả về toàn bộ buffer thu được.
+        Trả về toàn bộ buffer thu được (`flush_input=False`: gồm cả URC đang chờ trong buffer).
         """
         with self._lock:
-            try:
-                self.ser.reset_input_buffer()
-                self.ser.reset_output_buffer()
-            except Exception:
-                pass
+            if flush_input:
+                try:
+                    self.ser.reset_input_buffer()
+                    self.ser.reset_output_buffer()
+                except Exception:
+                    pass
 
             # gửi lệnh
             cmd = f'AT+CUSD=1,"{code}",{dcs}\r'
@@ -121,8 +146,8 @@ class SerialModem:
 
             # timeout: trả buf để bạn log xem đã nhận gì
             return buf
-    def cancel_ussd(self) -> str:
-        return self.send("AT+CUSD=2", max_wait_seconds=2.0)
+    def cancel_ussd(self, flush_input: bool = True) -> str:
+        return self.send("AT+CUSD=2", max_wait_seconds=2.0, flush_input=flush_input)
 
     def init_for_sms(self) -> None:
         self.send("AT")
@@ -156,17 +181,40 @@ class SerialModem:
             # bạn có thể regex bóc số ở đây nếu cần
             text = UssdUtils.normalize_text(text, dcs)
             msisdn = UssdUtils.extract_msisdn(text)
-            return text
+            self.logger.debug("USSD *101# port=%s text=%s", self.cfg.port, text)
+            return msisdn or ""
         return ""
 
-    def iter_lines(self):
-        while True:
+    def iter_lines(self, stop_event: Optional[threading.Event] = None, max_read_errors: int = 5):
+        """
+        Đọc từng dòng cho tới khi `stop_event` set.
+        Đọc lỗi thì backoff (0.1s -> 5s) thay vì quay vòng; lỗi liên tiếp `max_read_errors` lần
+        (thường là USB đã rút) thì raise lỗi cuối để worker thoát và PortManager probe lại port.
+        """
+        errors = 0
+        backoff = 0.0
+        while stop_event is None or not stop_event.is_set():
             try:
                 line = self.ser.readline().decode(errors="ignore")
-                if line:
-                    yield line
             except Exception as e:
-                self.logger.error("ex", e)
+                errors += 1
+                if errors >= max_read_errors:
+                    self.logger.error("READ FAILED port=%s errors=%s err=%s -> giving up", self.cfg.port, errors, e)
+                    raise
+                backoff = min(max(backoff * 2, 0.1), 5.0)
+                self.logger.warning("READ ERROR port=%s errors=%s err=%s retry in %.1fs",
+                                    self.cfg.port, errors, e, backoff)
+                if stop_event is not None:
+                    stop_event.wait(backoff)
+                else:
+                    time.sleep(backoff)
+                continue
+            errors = 0
+            backoff = 0.0
+            if line.strip():
+                self.last_rx_at = time.monotonic()
+            # yield cả chuỗi rỗng khi readline timeout để caller có nhịp idle (chạy task, check stop)
+            yield line
 
     def parse_cmti_index(self, line: str) -> int:
         try:
@@ -174,7 +222,7 @@ class SerialModem:
         # +CMTI: "SM",12
             return int(line.split(",")[1])
         except Exception as e:
-            self.logger.error("ex", e)
+            self.logger.warning("CMTI unparsable port=%s line=%r err=%s", self.cfg.port, line, e)
 
     def read_sms(self, idx: int) -> str:
         return self.send(f"AT+CMGR={idx}", max_wait_seconds=3.0)
@@ -0,0 +1,121 @@
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Chuỗi stage chính của 1 SMS, dùng chung cho writer và tools/trace_summary.
+STAGES = ("urc", "cmgr_sent", "cmgr_done", "parse", "extract", "commit")
+# Stage chạy song song với chuỗi chính -> stage mà nó bắt đầu tính từ đó
+SIDE_STAGES = {"deleted": "cmgr_done"}
+
+_ids = itertools.count(1)
+_id_prefix = f"{os.getpid():x}"
+
+
+class SmsTrace:
+    """Mốc thời gian của 1 SMS từ lúc thấy `+CMTI` tới lúc commit Redis."""
+    __slots__ = ("trace_id", "imei", "port", "index", "wall_start", "_t0", "marks", "sender", "smsc_at", "otp",
+                 "_holds")
+
+    def __init__(self, imei: str, port: str):
+        self.trace_id = f"{_id_prefix}-{next(_ids):x}"
+        self.imei = imei
+        self.port = port
+        self.index: Optional[int] = None
+        self.wall_start = time.time()
+        self._t0 = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = [("urc", 0.0)]
+        self.sender = ""
+        self.smsc_at: Optional[datetime] = None
+        self.otp = False
+        self._holds = 1
+
+    def hold(self) -> None:
+        """Thêm 1 bên phải gọi `SmsTracer.finish` trước khi record được ghi (vd delete chạy song song)."""
+        self._holds += 1
+
+    def mark(self, stage: str) -> None:
+        self.marks.append((stage, time.perf_counter() - self._t0))
+
+    def to_record(self) -> dict:
+        st = {stage: round(dt * 1000, 2) for stage, dt in self.marks}
+        rec = {
+            "id": self.trace_id,
+            "imei": self.imei,
+            "port": self.port,
+            "idx": self.index,
+            "sender": self.sender,
+            "otp": self.otp,
+            "t0": int(self.wall_start * 1000),
+            "st": st,
+        }
+        if self.smsc_at is not None:
+            smsc_ms = int(self.smsc_at.timestamp() * 1000)
+            rec["smsc"] = smsc_ms
+            end_ms = st.get("commit", self.marks[-1][1] * 1000)
+            rec["smsc_to_commit_ms"] = round(rec["t0"] + end_ms - smsc_ms, 2)
+        return rec
+
+
+@dataclass(frozen=True)
+class SmsTracerConfig:
+    enabled: bool = True
+    file: str = "logs/sms_trace.jsonl"
+    max_bytes: int = 20 * 1024 * 1024
+    backup_count: int = 5
+
+
+class SmsTracer:
+    """
+    Ghi span record (1 dòng JSON / SMS) ra file rotate riêng.
+    Thread gọi `finish` chỉ enqueue; việc ghi file do QueueListener làm.
+    """
+
+    def __init__(self, cfg: SmsTracerConfig):
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._logger = logging.getLogger("com.nasa.trace")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+
+    def start(self) -> None:
+        if not self.cfg.enabled:
+            return
+        os.makedirs(os.path.dirname(self.cfg.file) or ".", exist_ok=True)
+        fh = logging.handlers.RotatingFileHandler(
+            self.cfg.file, maxBytes=self.cfg.max_bytes, backupCount=self.cfg.backup_count, encoding="utf-8")
+        fh.setFormatter(logging.Formatter("%(message)s"))
+        q: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        self._logger.handlers.clear()
+        self._logger.addHandler(logging.handlers.QueueHandler(q))
+        self._listener = logging.handlers.QueueListener(q, fh)
+        self._listener.start()
+
+    def stop(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+            for h in listener.handlers:
+                h.close()
+        self._logger.handlers.clear()
+
+    def finish(self, trace: Optional[SmsTrace]) -> None:
+        if trace is None or self._listener is None:
+            return
+        with self._lock:
+            trace._holds -= 1
+            if trace._holds > 0:
+                return
+        try:
+            self._logger.info(json.dumps(trace.to_record(), ensure_ascii=False, separators=(",", ":")))
+        except Exception:
+            # trace là best effort, không ảnh hưởng luồng SMS
+            pass
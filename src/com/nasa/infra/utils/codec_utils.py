@@ -24,3 +24,15 @@ class UssdUtils:
 
         m = re.search(r"(0\d{9,10}|\+84\d{9})", text)
         return m.group(1) if m else None
+
+    @staticmethod
+    def normalize_msisdn(msisdn: Optional[str]) -> str:
+        """`+84912...` / `84912...` -> `0912...` để key Redis không phụ thuộc format nhà mạng trả về."""
+        if not msisdn:
+            return ""
+        m = re.sub(r"[^\d+]", "", msisdn.strip())
+        if m.startswith("+84"):
+            return "0" + m[3:]
+        if m.startswith("84") and len(m) >= 11:
+            return "0" + m[2:]
+        return m
@@ -0,0 +1,115 @@
+import json
+import struct
+from datetime import datetime, timezone
+
+from com.nasa.entities.otp_message import OtpMessage
+
+# encode_basestring (bản C) giữ nguyên ký tự unicode, giống json.dumps(ensure_ascii=False)
+_q = json.encoder.encode_basestring
+
+_TAG_CJSON = 0x01
+_TAG_BIN = 0x02
+_BIN_HEAD = struct.Struct(">BqI")  # tag, received_at (epoch ms), sms_index
+
+
+def _epoch_ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def _from_epoch_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+class OtpCodec:
+    """
+    Serialize `OtpMessage` thẳng ra bytes (không qua dict trung gian).
+
+    Byte đầu tiên là version tag nên reader decode được mọi format:
+    - `json`  : `{...}` giống payload cũ (key đầy đủ, received_at ISO) - tương thích consumer cũ
+    - `cjson` : 0x01 + JSON array không khoảng trắng, received_at là epoch ms
+    - `bin`   : 0x02 + header struct + các string dạng varint length + UTF-8 (kiểu msgpack)
+    """
+
+    FORMATS = ("json", "cjson", "bin")
+
+    def __init__(self, fmt: str = "json"):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"unsupported OTP value format: {fmt}")
+        self.fmt = fmt
+        self._encode = getattr(self, f"_encode_{fmt}")
+
+    def encode(self, msg: OtpMessage) -> bytes:
+        return self._encode(msg)
+
+    # ---- encoders ----
+
+    @staticmethod
+    def _encode_json(m: OtpMessage) -> bytes:
+        return (
+            f'{{"otp":{_q(m.otp)},"sender":{_q(m.sender)},"text":{_q(m.text)},'
+            f'"timestamp":{_q(m.timestamp)},"received_at":{_q(m.received_at.isoformat())},'
+            f'"port":{_q(m.port)},"imei":{_q(m.imei)},"msisdn":{_q(m.msisdn or "")},'
+            f'"index":{int(m.sms_index)}}}'
+        ).encode("utf-8")
+
+    @staticmethod
+    def _encode_cjson(m: OtpMessage) -> bytes:
+        return b"\x01" + (
+            f'[{_q(m.otp)},{_q(m.sender)},{_q(m.text)},{_q(m.timestamp)},{_epoch_ms(m.received_at)},'
+            f'{_q(m.port)},{_q(m.imei)},{_q(m.msisdn or "")},{int(m.sms_index)}]'
+        ).encode("utf-8")
+
+    @staticmethod
+    def _encode_bin(m: OtpMessage) -> bytes:
+        out = bytearray(_BIN_HEAD.pack(_TAG_BIN, _epoch_ms(m.received_at), int(m.sms_index)))
+        for s in (m.otp, m.sender, m.text, m.timestamp, m.port, m.imei, m.msisdn or ""):
+            b = s.encode("utf-8")
+            n = len(b)
+            while n >= 0x80:
+                out.append((n & 0x7F) | 0x80)
+                n >>= 7
+            out.append(n)
+            out += b
+        return bytes(out)
+
+    # ---- decoder ----
+
+    @staticmethod
+    def decode(data) -> OtpMessage:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        tag = data[0]
+
+        if tag == _TAG_BIN:
+            _, received_ms, index = _BIN_HEAD.unpack_from(data, 0)
+            pos = _BIN_HEAD.size
+            fields = []
+            for _ in range(7):
+                n = shift = 0
+                while True:
+                    c = data[pos]
+                    pos += 1
+                    n |= (c & 0x7F) << shift
+                    if c < 0x80:
+                        break
+                    shift += 7
+                fields.append(data[pos:pos + n].decode("utf-8"))
+                pos += n
+            otp, sender, text, timestamp, port, imei, msisdn = fields
+            received_at = _from_epoch_ms(received_ms)
+
+        elif tag == _TAG_CJSON:
+            otp, sender, text, timestamp, received_ms, port, imei, msisdn, index = json.loads(data[1:])
+            received_at = _from_epoch_ms(received_ms)
+
+        elif tag == ord("{"):
+            d = json.loads(data)
+            otp, sender, text, timestamp = d.get("otp", ""), d.get("sender", ""), d.get("text", ""), d.get("timestamp", "")
+            port, imei, msisdn, index = d.get("port", ""), d.get("imei", ""), d.get("msisdn", ""), d.get("index", 0)
+            received_at = datetime.fromisoformat(d["received_at"])
+
+        else:
+            raise ValueError(f"unknown OTP value tag: {tag:#x}")
+
+        return OtpMessage(otp=otp, sender=sender, imei=imei, msisdn=msisdn, port=port,
+                          received_at=received_at, text=text, timestamp=timestamp, sms_index=index)
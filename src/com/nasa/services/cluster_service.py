@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+from com.nasa.cache.redis.modem_registry import RedisModemRegistry
+
+
+class ClusterCoordinator:
+    """
+    Thread nền của cluster mode: renew lease IMEI cho các worker của host này,
+    publish heartbeat/registry, và dừng worker nào bị mất lease (host khác đã
+    takeover sau failover). Renew lỗi (mất kết nối Redis) liên tục thì dừng worker khi đã quá
+    `lease_ttl_seconds - interval_s` kể từ lần renew thành công cuối, tức trước khi lease hết hạn ở
+    Redis và host khác có thể takeover (tick kế tiếp đã là quá muộn). `SmsService.stop()` huỷ
+    readline đang block nên worker nhả port ngay, không phải chờ hết serial timeout.
+
+    `workers_provider` trả về snapshot `{imei: WorkerHandle}` của PortManager.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self,
+                 registry: RedisModemRegistry,
+                 workers_provider: Callable[[], Dict[str, object]],
+                 interval_s: float):
+        self.registry = registry
+        self.workers_provider = workers_provider
+        self.interval_s = interval_s
+        # imei -> monotonic time của lần renew thành công cuối
+        self._last_renew: Dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cluster-coordinator", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self.logger.info("started host=%s interval=%ss", self.registry.host_id, self.interval_s)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            try:
+                self.tick()
+            except Exception:
+                self.logger.exception("tick failed host=%s", self.registry.host_id)
+
+    def tick(self) -> None:
+        modems: List[Dict[str, str]] = []
+        workers = self.workers_provider()
+        for imei in list(self._last_renew):
+            if imei not in workers:
+                del self._last_renew[imei]
+        # tick sau tới muộn nhất sau interval_s -> phải dừng trước khi lease chỉ còn 1 interval
+        stop_after_s = max(self.registry.cfg.lease_ttl_seconds - self.interval_s, 0.0)
+        for imei, h in workers.items():
+            if not h.thread.is_alive():
+                continue
+            now = time.monotonic()
+            # worker mới spawn: lease vừa được acquire
+            last_ok = self._last_renew.setdefault(imei, now)
+            renewed = self.registry.renew(imei, h.port)
+            if renewed:
+                self._last_renew[imei] = now
+            elif renewed is None:
+                # đo sau khi renew trả về: renew lỗi có thể đã block tới socket timeout
+                elapsed = time.monotonic() - last_ok
+                if elapsed < stop_after_s:
+                    continue
+                self.logger.error("lease about to expire while redis unreachable imei=%s port=%s (%.1fs) "
+                                  "-> stopping worker", imei, h.port, elapsed)
+                h.service.stop()
+                del self._last_renew[imei]
+                continue
+            else:
+                self.logger.warning("lease lost imei=%s port=%s owner=%s -> stopping worker",
+                                    imei, h.port, self.registry.lease_owner(imei))
+                h.service.stop()
+                del self._last_renew[imei]
+                continue
+            silence_s = h.service.silence_s
+            modems.append({
+                "imei": imei,
+                "port": h.port,
+                "msisdn": h.service.msisdn or "",
+                "health": h.service.health,
+                "baudrate": str(h.service.baudrate),
+                "silence_s": str(int(silence_s)) if silence_s is not None else "",
+            })
+        self.registry.heartbeat(modems)
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from com.nasa.cache.redis.job_queue import RedisJobQueue
+from com.nasa.infra.utils.codec_utils import UssdUtils
+
+
+@dataclass(frozen=True)
+class ModemTask:
+    job: dict
+    on_done: Callable[[dict], None]
+
+
+class JobDispatcherService:
+    """
+    Poll `RedisJobQueue` và chia job cho các modem local đang rảnh.
+
+    - Mỗi modem chỉ nhận 1 task tại một thời điểm (SmsService.submit_task từ chối nếu đang bận).
+    - Modem đang xử lý SMS/task thì bỏ qua, lần poll sau thử lại -> không ảnh hưởng latency OTP.
+    - Rate limit toàn farm qua `RedisJobQueue.acquire_rate_slot`.
+    - Task chạy trên chính thread worker (giữa 2 lần đọc serial), kết quả ghi về Redis.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self,
+                 job_queue: RedisJobQueue,
+                 workers_provider: Callable[[], Dict[str, object]],
+                 host_id: str,
+                 poll_interval_s: float = 1.0):
+        self.job_queue = job_queue
+        self.workers_provider = workers_provider
+        self.host_id = host_id
+        self.poll_interval_s = poll_interval_s
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self.logger.info("started host=%s poll=%ss", self.host_id, self.poll_interval_s)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.poll_interval_s):
+            try:
+                self.dispatch_once()
+            except Exception:
+                self.logger.exception("dispatch failed host=%s", self.host_id)
+
+    def dispatch_once(self) -> int:
+        workers = {imei: h for imei, h in self.workers_provider().items() if h.thread.is_alive()}
+        if not workers:
+            return 0
+        dispatched = 0
+        for job in self.job_queue.pending_jobs():
+            targets = set(job.get("targets") or ())
+            # MSISDN so sánh sau khi chuẩn hoá: modem có thể trả `+84...` còn job gửi `09...`
+            msisdn_targets = {UssdUtils.normalize_msisdn(t) for t in targets}
+            claimed = self.job_queue.claimed(job["id"])
+            for imei, h in workers.items():
+                service = h.service
+                if imei in claimed or not service.idle:
+                    continue
+                if (targets and imei not in targets
+                        and UssdUtils.normalize_msisdn(service.msisdn) not in msisdn_targets):
+                    continue
+                if not self.job_queue.acquire_rate_slot():
+                    # hết quota giây này, để lần poll sau
+                    return dispatched
+                if not self.job_queue.claim(job["id"], imei, self.host_id):
+                    continue
+                if not service.submit_task(ModemTask(job=job, on_done=self._on_done(job, imei))):
+                    # vừa bận ngay sau khi check idle: bỏ claim để lần poll sau thử lại
+                    self.job_queue.unclaim(job["id"], imei)
+                    continue
+                dispatched += 1
+                self.logger.debug("dispatch job=%s imei=%s", job["id"], imei)
+        return dispatched
+
+    def _on_done(self, job: dict, imei: str) -> Callable[[dict], None]:
+        def done(result: dict) -> None:
+            result = {**result, "host": self.host_id, "finished_at": int(time.time())}
+            try:
+                self.job_queue.put_result(job, imei, result)
+            except Exception as e:
+                self.logger.warning("put result job=%s imei=%s err=%s", job["id"], imei, e)
+        return done
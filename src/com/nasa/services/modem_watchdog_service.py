@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from com.nasa.infra.serial.serial_modem import SerialModem
+
+
+class ModemHungError(Exception):
+    """Modem không phản hồi sau khi đã soft reset và reopen port -> worker thoát để PortManager spawn lại."""
+
+
+@dataclass(frozen=True)
+class ModemWatchdogConfig:
+    enabled: bool = True
+    idle_s: float = 30.0          # im lặng bao lâu thì gửi heartbeat `AT`
+    timeout_s: float = 2.0        # chờ response của heartbeat
+    max_failures: int = 3         # số heartbeat fail liên tiếp trước khi escalate
+    reset_wait_s: float = 20.0    # chờ modem boot lại sau `AT+CFUN=1,1`
+
+
+class ModemWatchdog:
+    """
+    Watchdog của 1 worker, chạy trên chính serial thread (gọi `tick()` ở nhịp idle của iter_lines)
+    nên heartbeat đi qua đường `send` bình thường, không tranh port với worker.
+
+    - Modem im lặng quá `idle_s` (không URC/OK/ERROR nào) -> gửi `AT`.
+    - `max_failures` heartbeat fail liên tiếp -> escalate:
+      1. soft reset `AT+CFUN=1,1`, chờ boot, reopen port + init lại
+      2. reopen port + init lại
+      3. raise `ModemHungError` (worker restart)
+
+    `state`: "ok" | "degraded" (heartbeat đang fail) | "recovering" (đang escalate).
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, cfg: ModemWatchdogConfig, modem: SerialModem, imei: str, stop_event: threading.Event):
+        self.cfg = cfg
+        self.modem = modem
+        self.imei = imei
+        self.stop_event = stop_event
+        self.state = "ok"
+        self.failures = 0
+        self.recoveries = 0
+        self._last_probe_at = time.monotonic()
+
+    @property
+    def silence_s(self) -> float:
+        return time.monotonic() - self.modem.last_rx_at
+
+    def tick(self) -> str:
+        """
+        Gọi khi worker rảnh. Trả về response của heartbeat (rỗng nếu không probe) để caller
+        xử lý URC (`+CMTI`) lẫn trong đó.
+        """
+        if not self.cfg.enabled:
+            return ""
+        now = time.monotonic()
+        if self.silence_s < self.cfg.idle_s or now - self._last_probe_at < self.cfg.idle_s:
+            return ""
+        self._last_probe_at = now
+
+        resp = self._heartbeat()
+        if resp is not None:
+            if self.failures:
+                self.logger.info("heartbeat recovered imei=%s port=%s after=%s failures",
+                                 self.imei, self.modem.cfg.port, self.failures)
+            self.failures = 0
+            self.state = "ok"
+            return resp
+
+        self.failures += 1
+        self.state = "degraded"
+        self.logger.warning("heartbeat failed imei=%s port=%s failures=%s/%s silence=%.0fs",
+                            self.imei, self.modem.cfg.port, self.failures, self.cfg.max_failures, self.silence_s)
+        if self.failures >= self.cfg.max_failures:
+            self._escalate()
+        return ""
+
+    def _heartbeat(self):
+        # không flush input: URC tới ngay trước heartbeat vẫn nằm trong response
+        resp = self.modem.send("AT", max_wait_seconds=self.cfg.timeout_s, flush_input=False)
+        if resp and ("OK" in resp or "ERROR" in resp):
+            return resp
+        return None
+
+    def _escalate(self) -> None:
+        port = self.modem.cfg.port
+        self.state = "recovering"
+
+        self.logger.error("modem hung imei=%s port=%s -> soft reset AT+CFUN=1,1", self.imei, port)
+        self.modem.send("AT+CFUN=1,1", max_wait_seconds=self.cfg.timeout_s)
+        if self.stop_event.wait(self.cfg.reset_wait_s):
+            return
+        if self._reinit("soft_reset"):
+            return
+
+        self.logger.error("modem still hung imei=%s port=%s -> reopen port", self.imei, port)
+        if self._reinit("reopen"):
+            return
+
+        raise ModemHungError(f"modem not responding imei={self.imei} port={port}")
+
+    def _reinit(self, step: str) -> bool:
+        # SerialException ở đây (USB re-enumerate sau reset) propagate lên worker -> worker restart
+        self.modem.reopen()
+        if self._heartbeat() is None:
+            return False
+        self.modem.init_for_sms()
+        self.failures = 0
+        self.recoveries += 1
+        self.state = "ok"
+        self._last_probe_at = time.monotonic()
+        self.logger.warning("modem recovered imei=%s port=%s step=%s recoveries=%s",
+                            self.imei, self.modem.cfg.port, step, self.recoveries)
+        return True
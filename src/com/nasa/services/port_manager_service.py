@@ -1,10 +1,12 @@
 import logging
 import threading
-import time
-from dataclasses import dataclass
-from typing import Dict, Optional, List
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, List, Sequence, Tuple
 
-from com.nasa.infra.serial.port_probe import ProbeConfig, list_candidate_ports, probe_imei
+from com.nasa.cache.redis.modem_registry import RedisModemRegistry
+from com.nasa.entities.modem import PortProfile
+from com.nasa.infra.serial.port_probe import ProbeConfig, list_candidate_ports, negotiate_baudrate, probe_imei
+from com.nasa.services.cluster_service import ClusterCoordinator
 from com.nasa.services.sms_service import SmsService
 
 # logger = logging.getLogger("com.nasa.services.PortManagerService")
@@ -14,6 +16,7 @@ class WorkerHandle:
     imei: str
     port: str
     thread: threading.Thread
+    service: SmsService
 
 class PortManagerService:
     logger = logging.getLogger(__name__)
@@ -24,7 +27,10 @@ class PortManagerService:
                  probe_timeout_s: float,
                  serial_timeout_s: float,
                  poll_interval_s: float,
-                 sms_service_factory):
+                 sms_service_factory,
+                 registry: Optional[RedisModemRegistry] = None,
+                 cluster_heartbeat_s: float = 3.0,
+                 baud_candidates: Sequence[int] = ()):
         self.manual_ports = manual_ports
         self.baudrate = baudrate
         self.scan_interval_s = scan_interval_s
@@ -35,41 +41,114 @@ class PortManagerService:
         self._stop_event = threading.Event()
         self.probe_cfg = ProbeConfig(baudrate=baudrate, timeout_seconds=probe_timeout_s)
         self.workers: Dict[str, WorkerHandle] = {}
+        # rỗng = không negotiate, chạy mọi port ở `baudrate`
+        self.baud_candidates = sorted(set(baud_candidates), reverse=True)
+        self.port_profiles: Dict[str, PortProfile] = {}
+        self.registry = registry
+        self.coordinator: Optional[ClusterCoordinator] = None
+        if registry is not None:
+            self.coordinator = ClusterCoordinator(registry, lambda: dict(self.workers), cluster_heartbeat_s)
 
-    def stop(self) -> None:
-        """Request PortManager to stop gracefully."""
+    def stop(self, join_timeout_s: Optional[float] = None) -> None:
+        """
+        Request PortManager to stop gracefully. Lease IMEI/port do chính worker nhả sau khi đã đóng
+        serial port (`_run_worker`), ở đây chỉ chờ các worker thoát.
+        """
         self._stop_event.set()
+        if self.coordinator is not None:
+            self.coordinator.stop()
+        workers = list(self.workers.values())
+        for h in workers:
+            h.service.stop()
+        timeout_s = join_timeout_s if join_timeout_s is not None else self.serial_timeout_s + 5.0
+        for h in workers:
+            h.thread.join(timeout_s)
+            if h.thread.is_alive():
+                # port vẫn đang mở -> giữ lease cho tới khi hết TTL thay vì để host khác mở chồng
+                self.logger.warning("worker did not stop imei=%s port=%s within %.1fs", h.imei, h.port, timeout_s)
+
+    def _run_worker(self, service: SmsService, imei: str, port: str) -> None:
+        """Thread target của worker: nhả lease sau khi run_forever đã đóng serial port."""
+        try:
+            service.run_forever()
+        finally:
+            try:
+                self._release(imei, port)
+            except Exception as e:
+                self.logger.warning("release failed imei=%s port=%s err=%s", imei, port, e)
+
+    def _release(self, imei: Optional[str], port: str) -> None:
+        if self.registry is None:
+            return
+        if imei:
+            self.registry.release_imei(imei)
+        self.registry.release_port(port)
+
+    def _probe(self, port: str) -> Tuple[Optional[str], int]:
+        """Probe ở rate đã lưu trong profile trước (modem có thể vẫn giữ rate đã negotiate), rồi rate mặc định."""
+        profile = self.port_profiles.get(port)
+        if profile is not None and profile.baudrate != self.baudrate:
+            imei = probe_imei(port, replace(self.probe_cfg, baudrate=profile.baudrate))
+            if imei:
+                return imei, profile.baudrate
+        return probe_imei(port, self.probe_cfg), self.baudrate
+
+    def _resolve_baudrate(self, port: str, imei: str, found_at: int) -> int:
+        if not self.baud_candidates:
+            return found_at
+        profile = self.port_profiles.get(port)
+        if profile is not None and profile.imei == imei and profile.baudrate == found_at:
+            return found_at
+        baud = negotiate_baudrate(port, replace(self.probe_cfg, baudrate=found_at), self.baud_candidates)
+        self.port_profiles[port] = PortProfile(port=port, imei=imei, baudrate=baud)
+        return baud
 
     def run_forever(self) -> None:
         self.logger.info("started manual_ports=%s baud=%s scan=%ss probe_timeout=%ss",
                     self.manual_ports, self.baudrate, self.scan_interval_s, self.probe_timeout_s)
+        if self.coordinator is not None:
+            self.coordinator.start()
 
         while not self._stop_event.is_set():
             dead = [imei for imei, h in self.workers.items() if not h.thread.is_alive()]
             for imei in dead:
-                self.logger.warning("worker dead imei=%s (was port=%s)", imei, self.workers[imei].port)
-                self.workers.pop(imei, None)
+                h = self.workers.pop(imei)
+                # lease đã được nhả trong `_run_worker` khi thread thoát
+                self.logger.warning("worker dead imei=%s (was port=%s)", imei, h.port)
 
             ports = list_candidate_ports(self.manual_ports)
             busy_ports = {h.port for h in self.workers.values()}
             candidates = [p for p in ports if p not in busy_ports]
             self.logger.info("candidate ports=%s (all=%s busy=%s)",candidates,ports,busy_ports),
             for port in candidates:
-                
-                imei = probe_imei(port, self.probe_cfg)
+                # cluster mode: port đang được process khác trên cùng máy dùng thì không probe
+                if self.registry is not None and not self.registry.acquire_port(port):
+                    self.logger.debug("port claimed by other host: %s", port)
+                    continue
+
+                imei, found_at = self._probe(port)
                 if not imei:
                     self.logger.debug("port not sim: %s", port)
+                    self._release(None, port)
                     continue
                 if imei in self.workers:
                     self.logger.debug("port in use: %s, imei: %s", port, imei)
+                    self._release(None, port)
+                    continue
+                if self.registry is not None and not self.registry.acquire_imei(imei):
+                    self.logger.info("imei leased by other host imei=%s port=%s owner=%s",
+                                     imei, port, self.registry.lease_owner(imei))
+                    self._release(None, port)
                     continue
 
-                service: SmsService = self.sms_service_factory(port, imei)
-                t = threading.Thread(target=service.run_forever, name=f"worker-{imei}", daemon=True)
+                baud = self._resolve_baudrate(port, imei, found_at)
+                service: SmsService = self.sms_service_factory(port, imei, baud)
+                t = threading.Thread(target=self._run_worker, args=(service, imei, port),
+                                     name=f"worker-{imei}", daemon=True)
 
-                self.workers[imei] = WorkerHandle(imei=imei, port=port, thread=t)
+                self.workers[imei] = WorkerHandle(imei=imei, port=port, thread=t, service=service)
                 t.start()
-                self.logger.info("spawned worker imei=%s port=%s", imei, port)
+                self.logger.info("spawned worker imei=%s port=%s baud=%s", imei, port, baud)
 
-            time.sleep(self.scan_interval_s)
+            self._stop_event.wait(self.scan_interval_s)
         self.logger.info("stopped")
@@ -0,0 +1,53 @@
+import logging
+import threading
+from typing import Callable, Dict, Set
+
+from com.nasa.cache.redis.sim_pool import RedisSimPool
+
+
+class SimPoolSyncService:
+    """
+    Đồng bộ worker local vào `RedisSimPool` mỗi `interval_s`:
+    SIM có worker `health == "ok"` và đã biết MSISDN được gia hạn alive (thêm vào pool nếu mới);
+    SIM vừa mất worker/degraded bị gỡ ngay thay vì chờ alive TTL hết hạn.
+    Mỗi host chỉ sync modem của mình nên chạy được cả khi bật cluster mode.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self,
+                 pool: RedisSimPool,
+                 workers_provider: Callable[[], Dict[str, object]],
+                 interval_s: float = 5.0):
+        self.pool = pool
+        self.workers_provider = workers_provider
+        self.interval_s = interval_s
+        self._alive: Set[str] = set()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sim-pool-sync", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        self.logger.info("started interval=%ss strategy=%s", self.interval_s, self.pool.cfg.strategy)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            try:
+                self.sync_once()
+            except Exception:
+                self.logger.exception("sync failed")
+
+    def sync_once(self) -> int:
+        alive = set()
+        for h in self.workers_provider().values():
+            if h.thread.is_alive() and h.service.health == "ok" and h.service.msisdn:
+                alive.add(h.service.msisdn)
+        dead = self._alive - alive
+        free = self.pool.sync(alive, dead)
+        if dead:
+            self.logger.info("sims removed from pool: %s", sorted(dead))
+        self._alive = alive
+        self.logger.debug("synced alive=%s free=%s", len(alive), free)
+        return free
@@ -0,0 +1,308 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from com.nasa.cache.redis.otp_cache import RedisOtpCache
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.infra.utils.codec_utils import UssdUtils
+from com.nasa.infra.parser.sms_parser import decode_ucs2_if_needed, parse_cmgr_text, parse_smsc_timestamp
+from com.nasa.infra.tracing.sms_tracer import SmsTrace, SmsTracer, SmsTracerConfig
+from com.nasa.services.otp_extract_service import OtpExtractService
+
+
+@dataclass(frozen=True)
+class SmsPipelineConfig:
+    parse_workers: int = 2
+    publish_workers: int = 4
+    queue_size: int = 1000
+    enqueue_timeout_s: float = 0.05
+    metrics_interval_s: float = 60.0
+
+
+@dataclass(frozen=True, slots=True)
+class RawSms:
+    """Response `AT+CMGR` thô do serial thread đọc được, chưa parse."""
+    imei: str
+    port: str
+    msisdn: str
+    index: int
+    resp: str
+    received_at: datetime
+    trace: Optional[SmsTrace] = None
+
+
+class StageMetrics:
+    def __init__(self, name: str, queues: Sequence["queue.Queue"]):
+        self.name = name
+        self.queues = queues
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self.queues)
+
+    def on_enqueue(self) -> None:
+        depth = self.depth()
+        with self._lock:
+            self.enqueued += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+    def on_drop(self) -> None:
+        with self._lock:
+            self.dropped += 1
+
+    def on_done(self, started: float, ok: bool) -> None:
+        took = time.monotonic() - started
+        with self._lock:
+            self.processed += 1
+            if not ok:
+                self.failed += 1
+            self.total_s += took
+            if took > self.max_s:
+                self.max_s = took
+
+    def snapshot(self, reset_max: bool = False) -> dict:
+        with self._lock:
+            snap = {
+                "stage": self.name,
+                "depth": self.depth(),
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "processed": self.processed,
+                "failed": self.failed,
+                "avg_ms": round(self.total_s / self.processed * 1000, 2) if self.processed else 0.0,
+                "max_ms": round(self.max_s * 1000, 2),
+            }
+            if reset_max:
+                self.max_depth = 0
+                self.max_s = 0.0
+        return snap
+
+
+class SmsPipeline:
+    """
+    Pool dùng chung cho mọi port: serial thread chỉ làm I/O (URC, AT+CMGR, AT+CMGD) rồi `submit`
+    response thô; parse/decode/extract và ghi Redis chạy trên các worker của pipeline.
+
+    Backpressure:
+    - parse queue đầy: serial thread chờ tối đa `enqueue_timeout_s` rồi bỏ SMS (`submit` trả False,
+      metric `dropped`); serial thread không xoá SMS đó khỏi SIM. Serial thread không bao giờ parse
+      hay chờ Redis.
+    - publish queue đầy: parse worker block cho tới khi có chỗ, đẩy áp lực ngược về parse queue.
+
+    Thứ tự: mỗi parse/publish worker có queue riêng, SMS được route theo owner (MSISDN, fallback IMEI)
+    ở cả 2 stage nên OTP của cùng 1 SIM luôn ghi Redis / báo listener đúng thứ tự nhận, kể cả khi
+    Redis chậm đột biến.
+
+    Latency trong metrics tính từ lúc enqueue tới khi stage xử lý xong (gồm thời gian chờ queue).
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, cfg: SmsPipelineConfig, otp_extractor: OtpExtractService, otp_cache: RedisOtpCache,
+                 tracer: Optional[SmsTracer] = None):
+        self.cfg = cfg
+        self.otp_extractor = otp_extractor
+        self.otp_cache = otp_cache
+        self.tracer = tracer or SmsTracer(SmsTracerConfig(enabled=False))
+        self._listeners: List[Callable[[OtpMessage], None]] = []
+        self._early_listeners: List[Callable[[OtpMessage], None]] = []
+        per_parse = max(1, cfg.queue_size // max(1, cfg.parse_workers))
+        self._parse_qs: List["queue.Queue"] = [queue.Queue(maxsize=per_parse)
+                                               for _ in range(cfg.parse_workers)]
+        per_publish = max(1, cfg.queue_size // max(1, cfg.publish_workers))
+        self._publish_qs: List["queue.Queue"] = [queue.Queue(maxsize=per_publish)
+                                                 for _ in range(cfg.publish_workers)]
+        self.parse_metrics = StageMetrics("parse", self._parse_qs)
+        self.publish_metrics = StageMetrics("publish", self._publish_qs)
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def add_listener(self, fn: Callable[[OtpMessage], None], before_commit: bool = False) -> None:
+        """
+        `fn(msg)` được gọi trên publish worker (đúng thứ tự theo owner) sau khi OTP đã ghi Redis;
+        `before_commit=True` thì gọi ngay trước khi ghi Redis - dùng cho consumer in-memory cần latency
+        thấp (Redis vẫn là bản lưu chính, không phải điều kiện để giao OTP).
+        """
+        (self._early_listeners if before_commit else self._listeners).append(fn)
+
+    def start(self) -> None:
+        for i, q in enumerate(self._parse_qs):
+            self._threads.append(threading.Thread(target=self._parse_loop, args=(q,),
+                                                  name=f"sms-parse-{i}", daemon=True))
+        for i, q in enumerate(self._publish_qs):
+            self._threads.append(threading.Thread(target=self._publish_loop, args=(q,),
+                                                  name=f"sms-publish-{i}", daemon=True))
+        if self.cfg.metrics_interval_s > 0:
+            self._threads.append(threading.Thread(target=self._metrics_loop, name="sms-pipeline-metrics", daemon=True))
+        for t in self._threads:
+            t.start()
+        self.logger.info("started parse_workers=%s publish_workers=%s queue_size=%s",
+                         self.cfg.parse_workers, self.cfg.publish_workers, self.cfg.queue_size)
+
+    def stop(self, timeout_s: float = 5.0) -> None:
+        """Xử lý nốt các SMS đang trong queue (tối đa `timeout_s`) rồi dừng worker."""
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout_s
+        for q in self._parse_qs:
+            self._put_sentinel(q, deadline)
+        for t in self._threads:
+            if t.name.startswith("sms-parse"):
+                t.join(max(0.0, deadline - time.monotonic()))
+        for q in self._publish_qs:
+            self._put_sentinel(q, deadline)
+        for t in self._threads:
+            if t.name.startswith("sms-publish"):
+                t.join(max(0.0, deadline - time.monotonic()))
+        self.logger.info("stopped %s %s", self.parse_metrics.snapshot(), self.publish_metrics.snapshot())
+
+    def _put_sentinel(self, q: "queue.Queue", deadline: float) -> None:
+        # queue đầy vì worker đang kẹt (vd Redis treo) -> bỏ qua, không để shutdown treo quá timeout_s
+        try:
+            q.put(None, timeout=max(0.01, deadline - time.monotonic()))
+        except queue.Full:
+            self.logger.warning("stop: queue still full, worker not signalled")
+
+    def snapshot(self) -> List[dict]:
+        return [self.parse_metrics.snapshot(), self.publish_metrics.snapshot()]
+
+    # ---- stage entry points ----
+
+    @staticmethod
+    def _route(qs: List["queue.Queue"], msisdn: str, imei: str) -> "queue.Queue":
+        owner = UssdUtils.normalize_msisdn(msisdn) or imei
+        return qs[hash(owner) % len(qs)]
+
+    def submit(self, raw: RawSms) -> bool:
+        """
+        Gọi từ serial thread, chờ tối đa `enqueue_timeout_s`. False = parse queue đầy, SMS bị bỏ
+        (caller giữ SMS trên SIM, không AT+CMGD).
+        """
+        try:
+            self._route(self._parse_qs, raw.msisdn, raw.imei).put(
+                (raw, time.monotonic()), timeout=self.cfg.enqueue_timeout_s)
+        except queue.Full:
+            self.parse_metrics.on_drop()
+            self.logger.error("parse queue full imei=%s port=%s idx=%s -> dropped, sms kept on sim",
+                              raw.imei, raw.port, raw.index)
+            if raw.trace is not None:
+                raw.trace.mark("dropped")
+            # hold của pipeline
+            self.tracer.finish(raw.trace)
+            return False
+        self.parse_metrics.on_enqueue()
+        return True
+
+    def _enqueue_publish(self, parsed: Tuple[OtpMessage, Optional[SmsTrace]]) -> None:
+        # chạy trên parse worker -> được phép block khi publish queue đầy
+        msg = parsed[0]
+        self._route(self._publish_qs, msg.msisdn, msg.imei).put((*parsed, time.monotonic()))
+        self.publish_metrics.on_enqueue()
+
+    # ---- stages ----
+
+    def _run_parse(self, item) -> Optional[Tuple[OtpMessage, Optional[SmsTrace]]]:
+        raw, started = item
+        trace = raw.trace
+        ok = False
+        try:
+            sms = parse_cmgr_text(raw.resp, raw.index)
+            if trace is not None:
+                trace.mark("parse")
+            if sms is None:
+                self.logger.warning("CMGR unparsable imei=%s port=%s idx=%s", raw.imei, raw.port, raw.index)
+                self.tracer.finish(trace)
+                return None
+            code = self.otp_extractor.extract(sms.text)
+            if trace is not None:
+                trace.mark("extract")
+                trace.sender = sms.sender
+                trace.otp = bool(code)
+                trace.smsc_at = parse_smsc_timestamp(decode_ucs2_if_needed(sms.timestamp))
+            ok = True
+            if not code:
+                self.logger.info("NO_OTP imei=%s port=%s sender=%s idx=%s",
+                                 raw.imei, raw.port, sms.sender, sms.index)
+                self.tracer.finish(trace)
+                return None
+            return OtpMessage(
+                otp=code,
+                sender=sms.sender,
+                imei=raw.imei,
+                msisdn=raw.msisdn,
+                port=raw.port,
+                received_at=raw.received_at,
+                text=sms.text,
+                timestamp=sms.timestamp,
+                sms_index=sms.index
+            ), trace
+        except Exception:
+            self.logger.exception("parse failed imei=%s port=%s idx=%s", raw.imei, raw.port, raw.index)
+            self.tracer.finish(trace)
+            return None
+        finally:
+            self.parse_metrics.on_done(started, ok)
+
+    def _run_publish(self, item) -> None:
+        msg, trace, started = item
+        ok = False
+        try:
+            self._notify(self._early_listeners, msg)
+            committed = self.otp_cache.put(msg)
+            if trace is not None:
+                # không có mốc "commit" = ghi Redis lỗi
+                if committed:
+                    trace.mark("commit")
+                self.tracer.finish(trace)
+            if committed:
+                self.logger.info("PUSH imei=%s port=%s sender=%s otp=%s idx=%s",
+                                 msg.imei, msg.port, msg.sender, msg.otp, msg.sms_index)
+            else:
+                self.logger.error("PUSH FAILED imei=%s port=%s sender=%s otp=%s idx=%s",
+                                  msg.imei, msg.port, msg.sender, msg.otp, msg.sms_index)
+            self._notify(self._listeners, msg)
+            ok = committed
+        finally:
+            self.publish_metrics.on_done(started, ok)
+
+    def _notify(self, listeners: List[Callable[[OtpMessage], None]], msg: OtpMessage) -> None:
+        for fn in listeners:
+            try:
+                fn(msg)
+            except Exception:
+                self.logger.exception("listener failed %r", fn)
+
+    def _parse_loop(self, q: "queue.Queue") -> None:
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            parsed = self._run_parse(item)
+            if parsed is not None:
+                self._enqueue_publish(parsed)
+
+    def _publish_loop(self, q: "queue.Queue") -> None:
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            try:
+                self._run_publish(item)
+            except Exception:
+                self.logger.exception("publish failed")
+
+    def _metrics_loop(self) -> None:
+        while not self._stop_event.wait(self.cfg.metrics_interval_s):
+            for snap in (self.parse_metrics.snapshot(reset_max=True), self.publish_metrics.snapshot(reset_max=True)):
+                self.logger.info("metrics %s", snap)
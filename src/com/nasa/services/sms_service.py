@@ -1,14 +1,17 @@
 import logging
-import time
+import threading
 from datetime import datetime, timezone
+from typing import Optional
 
 import serial
 
-from com.nasa.cache.redis.otp_cache import RedisOtpCache
-from com.nasa.entities.otp_message import OtpMessage
-from com.nasa.infra.parser.sms_parser import parse_cmgl_text, parse_cmgr_text
+from com.nasa.cache.redis.job_queue import RedisJobQueue
 from com.nasa.infra.serial.serial_modem import SerialModem, SerialConfig
-from com.nasa.services.otp_extract_service import OtpExtractService
+from com.nasa.infra.tracing.sms_tracer import SmsTrace
+from com.nasa.infra.utils.codec_utils import UssdUtils
+from com.nasa.services.job_dispatcher_service import ModemTask
+from com.nasa.services.modem_watchdog_service import ModemHungError, ModemWatchdog, ModemWatchdogConfig
+from com.nasa.services.sms_pipeline_service import RawSms, SmsPipeline
 
 # logger = logging.getLogger("com.nasa.services.SmsService")
 
@@ -21,36 +24,86 @@ class SmsService:
                  serial_timeout_s: float,
                  poll_interval_s: float,
                  delete_after_read: bool,
-                 otp_extractor: OtpExtractService,
-                 otp_cache: RedisOtpCache):
+                 pipeline: SmsPipeline,
+                 watchdog_cfg: Optional[ModemWatchdogConfig] = None):
         self.port = port
         self.imei = imei
         self.baudrate = baudrate
         self.serial_timeout_s = serial_timeout_s
         self.poll_interval_s = poll_interval_s
         self.delete_after_read = delete_after_read
-        self.otp_extractor = otp_extractor
-        self.otp_cache = otp_cache
+        self.pipeline = pipeline
+        self.watchdog_cfg = watchdog_cfg or ModemWatchdogConfig()
+        self.watchdog: Optional[ModemWatchdog] = None
+        self.msisdn: Optional[str] = None
+        # vòng đời worker: "starting" -> "ok" -> "stopped"; lúc "ok" thì health lấy live từ watchdog
+        self._lifecycle = "starting"
+        self._stop_event = threading.Event()
+        self._task_lock = threading.Lock()
+        self._task: Optional[ModemTask] = None
+        self._busy = False
+        self._modem: Optional[SerialModem] = None
+
+    def stop(self) -> None:
+        """Request worker to stop; huỷ readline đang block để run_forever thoát ngay, không chờ serial timeout."""
+        self._stop_event.set()
+        modem = self._modem
+        if modem is not None:
+            modem.cancel_read()
+
+    @property
+    def health(self) -> str:
+        """
+        "starting" | "ok" | "degraded" | "recovering" | "stopped". Đọc live từ watchdog nên thread
+        khác (cluster heartbeat, SIM pool) thấy được "recovering" trong lúc serial thread đang reset modem.
+        """
+        if self._lifecycle == "ok" and self.watchdog is not None:
+            return self.watchdog.state
+        return self._lifecycle
+
+    @property
+    def idle(self) -> bool:
+        """Sẵn sàng nhận task: đã init xong, không xử lý SMS và chưa có task chờ."""
+        return self.health == "ok" and not self._busy and self._task is None
+
+    @property
+    def silence_s(self) -> Optional[float]:
+        """Số giây từ lần cuối modem trả về response hợp lệ (None nếu chưa mở port)."""
+        return self.watchdog.silence_s if self.watchdog is not None else None
+
+    def submit_task(self, task: ModemTask) -> bool:
+        """Giao 1 task USSD/AT cho worker; chạy trên thread worker giữa 2 lần đọc serial."""
+        with self._task_lock:
+            if not self.idle:
+                return False
+            self._task = task
+            return True
 
     def run_forever(self) -> None:
         modem = SerialModem(SerialConfig(port=self.port, baudrate=self.baudrate, timeout_seconds=self.serial_timeout_s))
+        self._modem = modem
         try:
             modem.init_for_sms()
             self.logger.info("connected imei=%s port=%s", self.imei, self.port)
             msisdn = modem.get_MSISDN101()
+            self.msisdn = msisdn
             self.logger.info("msisdn: %s", msisdn)
             # while True:
             modem.delete_all_sms()
-            for line in modem.iter_lines():
+            self.watchdog = ModemWatchdog(self.watchdog_cfg, modem, self.imei, self._stop_event)
+            self._lifecycle = "ok"
+            for line in modem.iter_lines(self._stop_event):
                 line = line.strip()
-                if not line:
-                    continue
-                if line.startswith("+CME ERROR"):
-                    continue
+                # xử lý dòng vừa đọc trước, task chạy sau để +CMTI không phải chờ task
                 if line.startswith("+CMTI"):
+                    trace = SmsTrace(self.imei, self.port)
                     idx = modem.parse_cmti_index(line)
-                    self.logger.debug("sms arrived imei=%s idx=%s", self.imei, idx)
-                    self._handle_sms(modem, idx, msisdn)
+                    self.logger.debug("sms arrived imei=%s idx=%s trace=%s", self.imei, idx, trace.trace_id)
+                    self._handle_sms(modem, idx, msisdn, trace)
+                if self._task is not None:
+                    self._run_task(modem, msisdn)
+                elif not line:
+                    self._watchdog_tick(modem, msisdn)
                 continue
 
                 # resp = modem.list_unread()
@@ -98,44 +151,106 @@ class SmsService:
         except (serial.SerialException, OSError) as e:
             self.logger.error("DISCONNECTED imei=%s port=%s err=%s", self.imei, self.port, e, exc_info=True)
             raise
+        except ModemHungError as e:
+            self.logger.error("HUNG imei=%s port=%s err=%s -> worker restart", self.imei, self.port, e)
+            raise
         finally:
+            self._lifecycle = "stopped"
+            self._modem = None
             modem.close()
             self.logger.info("stopped imei=%s port=%s", self.imei, self.port)
 
-    def _handle_sms(self, modem, idx, msisdn):
+    def _watchdog_tick(self, modem: SerialModem, msisdn: str) -> None:
+        resp = self.watchdog.tick()
+        # +CMTI tới ngay trước heartbeat nằm trong response của `AT`
+        self._handle_urcs(modem, resp, msisdn)
+
+    def _run_task(self, modem: SerialModem, msisdn: str) -> None:
+        with self._task_lock:
+            task, self._task = self._task, None
+        job = task.job
+        self._busy = True
+        try:
+            # job có thể do producer khác ghi vào Redis -> vẫn chặn timeout ở đây
+            timeout_s = min(float(job.get("timeout_s") or 12.0), RedisJobQueue.MAX_TIMEOUT_S)
+            # không flush input: +CMTI đang nằm trong buffer sẽ có trong response, xử lý ở _handle_urcs
+            if job["action"] == "ussd":
+                resp = modem.send_ussd_wait(job["command"], timeout_s=timeout_s, flush_input=False)
+                mode, text, dcs = modem.parse_ussd(resp)
+                if mode == 1:
+                    # phiên USSD còn mở (menu) -> đóng lại để không giữ modem
+                    resp += modem.cancel_ussd(flush_input=False) or ""
+                result = {
+                    "status": "ok" if text is not None else "timeout",
+                    "text": UssdUtils.normalize_text(text, dcs) if text else "",
+                    "response": resp or "",
+                }
+            else:
+                resp = modem.send(job["command"], max_wait_seconds=timeout_s, flush_input=False)
+                if resp is None:
+                    result = {"status": "error", "response": ""}
+                else:
+                    status = "error" if "ERROR" in resp else ("ok" if "OK" in resp else "timeout")
+                    result = {"status": status, "response": resp}
+            self.logger.info("TASK job=%s imei=%s action=%s status=%s",
+                             job["id"], self.imei, job["action"], result["status"])
+        except Exception as e:
+            self.logger.exception("TASK FAILED job=%s imei=%s", job["id"], self.imei)
+            result = {"status": "error", "response": str(e)}
+            resp = None
+        finally:
+            self._busy = False
+
+        task.on_done({**result, "imei": self.imei, "msisdn": msisdn or ""})
+        # +CMTI tới trong lúc chờ response của task bị nuốt vào buffer -> xử lý lại ở đây
+        self._handle_urcs(modem, resp, msisdn)
+
+    def _handle_urcs(self, modem: SerialModem, resp: Optional[str], msisdn: str) -> None:
+        for line in (resp or "").splitlines():
+            line = line.strip()
+            if line.startswith("+CMTI"):
+                # URC thật đã tới lúc lệnh khác còn chạy; trace tính từ lúc thấy nó ở đây
+                trace = SmsTrace(self.imei, self.port)
+                idx = modem.parse_cmti_index(line)
+                self.logger.debug("sms arrived in response imei=%s idx=%s trace=%s", self.imei, idx, trace.trace_id)
+                self._handle_sms(modem, idx, msisdn, trace)
+
+    def _handle_sms(self, modem, idx, msisdn, trace: SmsTrace):
+        self._busy = True
+        try:
+            self._process_sms(modem, idx, msisdn, trace)
+        finally:
+            self._busy = False
+
+    def _process_sms(self, modem, idx, msisdn, trace: SmsTrace):
+        # serial thread chỉ làm I/O; parse/extract/ghi Redis do SmsPipeline xử lý
+        trace.index = idx
+        trace.mark("cmgr_sent")
         resp = modem.read_sms(idx)  # AT+CMGR=idx
-        sms = parse_cmgr_text(resp, idx)
+        trace.mark("cmgr_done")
+        submitted = False
+        if not resp or "+CMGR:" not in resp:
+            self.logger.warning("CMGR failed imei=%s port=%s idx=%s resp=%r", self.imei, self.port, idx, resp)
+        else:
+            # serial thread luôn finish ở cuối -> cần 1 hold riêng ngoài hold của pipeline
+            trace.hold()
+            submitted = self._submit(idx, msisdn, resp, trace)
+        # chỉ xoá khi đã đọc trọn SMS (có OK cuối) và pipeline đã nhận; còn lại SMS giữ trên SIM
+        complete = bool(resp) and resp.rstrip().endswith("OK")
+        # AT+CMGD chạy sau khi đã giao cho pipeline để không cộng thêm 1 round trip vào latency OTP
+        if self.delete_after_read and idx is not None and submitted and complete:
+            modem.delete_sms(idx)
+            trace.mark("deleted")
+        self.pipeline.tracer.finish(trace)
 
-        code = self.otp_extractor.extract(sms.text)
-        msg = OtpMessage(
-            otp=code or "",
-            sender=sms.sender,
+    def _submit(self, idx, msisdn, resp: str, trace: SmsTrace) -> bool:
+        return self.pipeline.submit(RawSms(
             imei=self.imei,
-            msisdn=msisdn,
             port=self.port,
-            received_at=datetime.now(timezone.utc),
-            text=sms.text,
-            timestamp=sms.timestamp,
-            sms_index=sms.index
-        )
-
-        payload = {
-            "otp": msg.otp,
-            "sender": msg.sender,
-            "text": msg.text,
-            "timestamp": msg.timestamp,
-            "received_at": msg.received_at.isoformat(),
-            "port": msg.port,
-            "imei": msg.imei,
-            "index": msg.sms_index,
-        }
-        if code:
-            self.otp_cache.put(msg.sender, payload)
-            self.logger.info("PUSH imei=%s port=%s sender=%s otp=%s idx=%s",
-                             self.imei, self.port, sms.sender, code, sms.index)
-        else:
-            self.logger.info("NO_OTP imei=%s port=%s sender=%s idx=%s",
-                             self.imei, self.port, sms.sender, sms.index)
-
-        if self.delete_after_read:
-            modem.delete_sms(sms.index)
+            msisdn=msisdn or "",
+            index=idx,
+            resp=resp,
+            # received_at = lúc thấy +CMTI, không phải lúc AT+CMGR trả về
+            received_at=datetime.fromtimestamp(trace.wall_start, timezone.utc),
+            trace=trace,
+        ))
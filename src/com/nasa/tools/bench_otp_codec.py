@@ -0,0 +1,111 @@
+"""
+Benchmark encode OTP value: bytes/message, peak allocation/message và thời gian encode/decode.
+
+    python -m com.nasa.tools.bench_otp_codec [-n 20000]
+
+`legacy` là đường cũ: dataclass không slots + payload dict + json.dumps(ensure_ascii=False).
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.infra.utils.otp_codec import OtpCodec
+
+
+@dataclass(frozen=True)
+class _LegacyOtpMessage:
+    otp: str
+    sender: str
+    imei: str
+    msisdn: str
+    port: str
+    received_at: datetime
+    text: str
+    timestamp: str
+    sms_index: int
+
+
+_FIELDS = dict(
+    otp="123456",
+    sender="VCB",
+    imei="861234567890123",
+    msisdn="0912345678",
+    port="/dev/ttyUSB3",
+    text="Ma OTP cua Quy khach la 123456. Có hiệu lực trong 5 phút. KHONG chia se ma nay.",
+    timestamp="24/01/02,10:11:12+28",
+    sms_index=12,
+)
+
+
+def _legacy_encode(cls=_LegacyOtpMessage) -> bytes:
+    m = cls(received_at=datetime.now(timezone.utc), **_FIELDS)
+    payload = {
+        "otp": m.otp,
+        "sender": m.sender,
+        "text": m.text,
+        "timestamp": m.timestamp,
+        "received_at": m.received_at.isoformat(),
+        "port": m.port,
+        "imei": m.imei,
+        "index": m.sms_index,
+    }
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _measure(name: str, make, n: int, decode=None) -> None:
+    value = make()
+
+    # peak memory của 1 lần build entity + encode (dict/string trung gian đều được tính)
+    tracemalloc.start()
+    peaks = []
+    for _ in range(1000):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        v = make()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        del v
+    tracemalloc.stop()
+    peak = sum(peaks) / len(peaks)
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        make()
+    enc_us = (time.perf_counter() - t0) / n * 1e6
+
+    dec_us = float("nan")
+    if decode is not None:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            decode(value)
+        dec_us = (time.perf_counter() - t0) / n * 1e6
+
+    print(f"{name:<8} {len(value):>6} {peak:>12.0f} {enc_us:>10.2f} {dec_us:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench_otp_codec")
+    parser.add_argument("-n", type=int, default=20000, help="số vòng đo thời gian")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    slotted = OtpMessage(received_at=now, **_FIELDS)
+    legacy = _LegacyOtpMessage(received_at=now, **_FIELDS)
+    print(f"entity size: OtpMessage(slots)={sys.getsizeof(slotted)}B "
+          f"legacy={sys.getsizeof(legacy) + sys.getsizeof(legacy.__dict__)}B (object + __dict__)")
+    print()
+    print(f"{'format':<8} {'bytes':>6} {'peak B/msg':>12} {'enc us':>10} {'dec us':>10}")
+
+    _measure("legacy", _legacy_encode, args.n, decode=json.loads)
+    for fmt in OtpCodec.FORMATS:
+        codec = OtpCodec(fmt)
+        _measure(fmt, lambda c=codec: c.encode(OtpMessage(received_at=datetime.now(timezone.utc), **_FIELDS)),
+                 args.n, decode=OtpCodec.decode)
+
+
+if __name__ == "__main__":
+    main()
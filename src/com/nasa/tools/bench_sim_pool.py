@@ -0,0 +1,124 @@
+"""
+Benchmark cấp SIM: nhiều thread lease/release đồng thời trên pool cỡ khác nhau.
+
+    python -m com.nasa.tools.bench_sim_pool [--sizes 1000,10000,100000] [--threads 64] [--ops 20000]
+
+Chạy vào `REDIS_URL` (keyspace riêng `--prefix`, xoá sau mỗi vòng). Latency phía server lấy từ
+`INFO commandstats` (evalsha usec_per_call) nên không lẫn network; latency gần như không đổi khi
+pool tăng 100 lần = lease O(log n). Cột `double` phải luôn là 0 (không SIM nào bị cấp cho 2 consumer).
+"""
+import argparse
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from com.nasa.app.config import load_config
+from com.nasa.cache.redis.redis_client import create_redis
+from com.nasa.cache.redis.sim_pool import RedisSimPool, RedisSimPoolConfig
+
+
+def _cleanup(client, prefix: str) -> None:
+    keys = list(client.scan_iter(match=prefix + "*", count=1000))
+    for i in range(0, len(keys), 1000):
+        client.delete(*keys[i:i + 1000])
+
+
+def _server_usec_per_call(client):
+    try:
+        stats = client.info("commandstats")
+    except Exception:
+        return None
+    s = stats.get("cmdstat_evalsha")
+    return float(s["usec_per_call"]) if s else None
+
+
+def _run(client, args, size: int) -> None:
+    pool = RedisSimPool(client, RedisSimPoolConfig(key_prefix=args.prefix, strategy=args.strategy,
+                                                   lease_ttl_seconds=60, cooldown_seconds=args.cooldown,
+                                                   alive_ttl_seconds=600))
+    _cleanup(client, args.prefix)
+    for i in range(0, size, 1000):
+        pool.sync([f"09{n:08d}" for n in range(i, min(size, i + 1000))])
+
+    senders = [f"bank{i}" for i in range(args.senders)]
+    held = set()
+    lock = threading.Lock()
+    lat = []
+    counters = {"empty": 0, "double": 0}
+    per_thread = args.ops // args.threads
+
+    def worker():
+        rnd = random.Random()
+        mine = []
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            lease = pool.lease(sender=rnd.choice(senders), consumer="bench")
+            took = time.perf_counter() - t0
+            with lock:
+                lat.append(took)
+                if lease is None:
+                    counters["empty"] += 1
+                    continue
+                if lease.msisdn in held:
+                    counters["double"] += 1
+                held.add(lease.msisdn)
+            mine.append(lease)
+            # giữ vài lease song song để pool luôn có SIM đang bận
+            if len(mine) > args.hold:
+                old = mine.pop(0)
+                with lock:
+                    held.discard(old.msisdn)
+                pool.release(old.msisdn, old.lease_id)
+        for old in mine:
+            with lock:
+                held.discard(old.msisdn)
+            pool.release(old.msisdn, old.lease_id)
+
+    try:
+        client.config_resetstat()
+    except Exception:
+        pass
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    lat.sort()
+    p50 = lat[len(lat) // 2] * 1000
+    p99 = lat[int(len(lat) * 0.99)] * 1000
+    server = _server_usec_per_call(client)
+    server_s = f"{server:>10.1f}" if server is not None else f"{'n/a':>10}"
+    print(f"{size:>8} {len(lat) / wall:>10.0f} {p50:>8.2f} {p99:>8.2f} {server_s} "
+          f"{counters['empty']:>6} {counters['double']:>6}")
+    _cleanup(client, args.prefix)
+
+
+def main():
+    load_dotenv()
+    cfg = load_config()
+
+    parser = argparse.ArgumentParser(prog="bench_sim_pool")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="số SIM trong pool, phân cách bằng dấu phẩy")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--ops", type=int, default=20000, help="tổng số lease mỗi vòng")
+    parser.add_argument("--hold", type=int, default=4, help="số lease mỗi thread giữ đồng thời")
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--cooldown", type=float, default=300.0)
+    parser.add_argument("--strategy", choices=RedisSimPool.STRATEGIES, default="lru")
+    parser.add_argument("--prefix", default="bench:sim:")
+    args = parser.parse_args()
+
+    client = create_redis(cfg.redis_url)
+    print(f"redis={cfg.redis_url} threads={args.threads} ops={args.ops} strategy={args.strategy}")
+    print(f"{'sims':>8} {'lease/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'srv us':>10} {'empty':>6} {'double':>6}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        _run(client, args, size)
+
+
+if __name__ == "__main__":
+    main()
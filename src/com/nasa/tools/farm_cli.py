@@ -0,0 +1,95 @@
+import argparse
+import json
+import socket
+import time
+
+from dotenv import load_dotenv
+
+from com.nasa.app.config import load_config
+from com.nasa.cache.redis.job_queue import RedisJobQueue, RedisJobQueueConfig
+from com.nasa.cache.redis.modem_registry import RedisModemRegistry, RedisModemRegistryConfig
+from com.nasa.cache.redis.redis_client import create_redis
+
+
+def _job_queue(cfg) -> RedisJobQueue:
+    return RedisJobQueue(create_redis(cfg.redis_url), RedisJobQueueConfig(
+        key_prefix=cfg.jobs_key_prefix,
+        result_ttl_seconds=cfg.jobs_result_ttl_seconds,
+        rate_limit_per_s=cfg.jobs_rate_limit_per_s,
+    ))
+
+
+def cmd_submit(registry: RedisModemRegistry, args) -> None:
+    q = _job_queue(args.cfg)
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()] if args.targets else None
+    job_id = q.submit(args.action, args.command, targets, timeout_s=args.timeout)
+    print(job_id)
+    if args.wait:
+        deadline = time.time() + args.wait
+        while time.time() < deadline:
+            if targets and len(q.results(job_id)) >= len(targets):
+                break
+            time.sleep(1.0)
+        _print_results(q, job_id)
+
+
+def cmd_result(registry: RedisModemRegistry, args) -> None:
+    _print_results(_job_queue(args.cfg), args.job_id)
+
+
+def _print_results(q: RedisJobQueue, job_id: str) -> None:
+    results = q.results(job_id)
+    print(json.dumps({"job": q.get_job(job_id), "claimed": q.claimed(job_id), "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+def cmd_status(registry: RedisModemRegistry, args) -> None:
+    hosts = registry.list_hosts()
+    modems = registry.list_modems()
+
+    print(f"HOSTS ({len(hosts)})")
+    for h in hosts:
+        print(f"  {h['host']:<32} node={h['node']:<20} workers={h['workers']}")
+
+    healthy = sum(1 for m in modems if m.get("health") == "ok" and m.get("leased_by"))
+    print(f"MODEMS ({len(modems)}, healthy={healthy})")
+    print(f"  {'IMEI':<17} {'HOST':<32} {'PORT':<16} {'MSISDN':<14} {'HEALTH':<10} {'SILENT':>6} LEASED_BY")
+    for m in modems:
+        print(f"  {m.get('imei', ''):<17} {m.get('host', ''):<32} {m.get('port', ''):<16} "
+              f"{m.get('msisdn', ''):<14} {m.get('health', ''):<10} {m.get('silence_s', ''):>6} {m.get('leased_by', '')}")
+
+
+def main():
+    load_dotenv()
+    cfg = load_config()
+
+    parser = argparse.ArgumentParser(prog="farm_cli", description="Xem trạng thái modem farm (cluster mode)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="liệt kê host + modem trong registry").set_defaults(func=cmd_status)
+
+    p_submit = sub.add_parser("submit", help="submit job USSD/AT cho nhiều modem")
+    p_submit.add_argument("--action", choices=RedisJobQueue.ACTIONS, default="ussd")
+    p_submit.add_argument("--command", required=True, help='vd "*101#" hoặc "AT+CSQ"')
+    p_submit.add_argument("--targets", default="", help="IMEI/MSISDN, phân cách bằng dấu phẩy; bỏ trống = tất cả")
+    p_submit.add_argument("--timeout", type=float, default=12.0)
+    p_submit.add_argument("--wait", type=float, default=0.0, help="chờ kết quả N giây rồi in ra")
+    p_submit.set_defaults(func=cmd_submit)
+
+    p_result = sub.add_parser("result", help="xem kết quả job")
+    p_result.add_argument("job_id")
+    p_result.set_defaults(func=cmd_result)
+
+    args = parser.parse_args()
+    args.cfg = cfg
+
+    registry = RedisModemRegistry(create_redis(cfg.redis_url), RedisModemRegistryConfig(
+        host_id=cfg.cluster_host_id,
+        node=socket.gethostname(),
+        key_prefix=cfg.cluster_key_prefix,
+        lease_ttl_seconds=cfg.cluster_lease_ttl_s,
+    ))
+    args.func(registry, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Tổng hợp latency từng stage theo modem từ file trace SMS (TRACE_FILE, gồm cả file đã rotate).
+
+    python -m com.nasa.tools.trace_summary [logs/sms_trace.jsonl] [--imei ...] [--since-minutes 60]
+"""
+import argparse
+import glob
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from com.nasa.infra.tracing.sms_tracer import SIDE_STAGES, STAGES
+
+PCTS = (50, 90, 99)
+
+
+def _percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return float("nan")
+    k = (len(sorted_vals) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def _segments(rec: dict) -> Dict[str, float]:
+    """Khoảng thời gian giữa 2 stage liên tiếp có mặt trong record, cộng tổng và smsc->commit."""
+    st = rec.get("st", {})
+    out = {}
+    present = [s for s in STAGES if s in st]
+    for a, b in zip(present, present[1:]):
+        out[f"{a}->{b}"] = st[b] - st[a]
+    for side, start in SIDE_STAGES.items():
+        if side in st and start in st:
+            out[f"{start}->{side}"] = st[side] - st[start]
+    if "commit" in st:
+        out["urc->commit"] = st["commit"]
+    if "smsc_to_commit_ms" in rec:
+        out["smsc->commit"] = rec["smsc_to_commit_ms"]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="trace_summary")
+    parser.add_argument("file", nargs="?", default="logs/sms_trace.jsonl")
+    parser.add_argument("--imei", default="", help="chỉ lấy 1 modem")
+    parser.add_argument("--since-minutes", type=float, default=0.0)
+    args = parser.parse_args()
+
+    since_ms = (time.time() - args.since_minutes * 60) * 1000 if args.since_minutes else 0
+    data: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    counts: Dict[str, int] = defaultdict(int)
+
+    for path in sorted(glob.glob(args.file + "*")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if args.imei and rec.get("imei") != args.imei:
+                    continue
+                if rec.get("t0", 0) < since_ms:
+                    continue
+                key = f"{rec.get('imei')} {rec.get('port')}"
+                counts[key] += 1
+                for seg, v in _segments(rec).items():
+                    data[key][seg].append(v)
+
+    if not data:
+        print("no trace records")
+        return
+
+    def seg_key(seg: str):
+        a, b = seg.split("->")
+        if a in STAGES and b in STAGES and seg != "urc->commit":
+            return (0, STAGES.index(a), STAGES.index(b))
+        totals = ("urc->commit", "smsc->commit")
+        return (2, totals.index(seg), seg) if seg in totals else (1, 0, seg)
+    for key in sorted(data):
+        print(f"== {key}  sms={counts[key]}")
+        print(f"  {'segment (ms)':<22} {'n':>6} " + " ".join(f"{'p' + str(p):>9}" for p in PCTS) + f" {'max':>9}")
+        for seg in sorted(data[key], key=seg_key):
+            vals = sorted(data[key][seg])
+            pct = " ".join(f"{_percentile(vals, p):>9.1f}" for p in PCTS)
+            print(f"  {seg:<22} {len(vals):>6} {pct} {vals[-1]:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
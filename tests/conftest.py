@@ -0,0 +1,5 @@
+import os
+import sys
+
+# chạy từ root repo: `python -m pytest -q` (package nằm trong src/, giống `python -m com.nasa.app.main` chạy từ src)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,104 @@
+import threading
+from types import SimpleNamespace
+
+from com.nasa.services import cluster_service
+from com.nasa.services.cluster_service import ClusterCoordinator
+from com.nasa.services.port_manager_service import PortManagerService, WorkerHandle
+
+
+class _Registry:
+    host_id = "h1"
+    cfg = SimpleNamespace(lease_ttl_seconds=10.0)
+
+    def __init__(self):
+        self.renew_result = True
+        self.released = []
+        self.heartbeats = []
+
+    def renew(self, imei, port):
+        return self.renew_result
+
+    def lease_owner(self, imei):
+        return "h2"
+
+    def heartbeat(self, modems):
+        self.heartbeats.append(modems)
+
+    def release_imei(self, imei):
+        self.released.append(("imei", imei))
+
+    def release_port(self, port):
+        self.released.append(("port", port))
+
+
+class _Service:
+    msisdn = "0911111111"
+    health = "ok"
+    baudrate = 115200
+    silence_s = 1.0
+
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run_forever(self):
+        self.stopped.wait(5)
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def monotonic(self):
+        return self.t
+
+
+def _alive_handle(service):
+    t = threading.Thread(target=service.run_forever, daemon=True)
+    t.start()
+    return WorkerHandle(imei="86", port="COM5", thread=t, service=service)
+
+
+def test_worker_stopped_before_lease_expires_when_redis_down(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cluster_service, "time", clock)
+    reg, svc = _Registry(), _Service()
+    h = _alive_handle(svc)
+    coord = ClusterCoordinator(reg, lambda: {"86": h}, interval_s=3.0)
+
+    coord.tick()
+    reg.renew_result = None
+    clock.t += 6.9
+    coord.tick()
+    assert not svc.stopped.is_set()
+    # tick sau (t+9.9) đã sát hạn lease 10s -> phải dừng ở tick này
+    clock.t += 0.1
+    coord.tick()
+    assert svc.stopped.is_set()
+    h.thread.join(1)
+
+
+def test_worker_stopped_on_lease_lost():
+    reg, svc = _Registry(), _Service()
+    reg.renew_result = False
+    h = _alive_handle(svc)
+    ClusterCoordinator(reg, lambda: {"86": h}, interval_s=3.0).tick()
+    assert svc.stopped.is_set()
+    assert reg.heartbeats == [[]]
+    h.thread.join(1)
+
+
+def test_leases_released_only_after_worker_exits():
+    reg = _Registry()
+    pm = PortManagerService(None, 115200, 1.0, 0.1, 0.1, 0.1, None, registry=reg)
+    svc = _Service()
+    t = threading.Thread(target=pm._run_worker, args=(svc, "86", "COM5"), daemon=True)
+    pm.workers["86"] = WorkerHandle(imei="86", port="COM5", thread=t, service=svc)
+    t.start()
+    assert reg.released == []
+
+    pm.stop()
+    assert not t.is_alive()
+    assert reg.released == [("imei", "86"), ("port", "COM5")]
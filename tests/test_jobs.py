@@ -0,0 +1,138 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from com.nasa.cache.redis.job_queue import RedisJobQueue, RedisJobQueueConfig
+from com.nasa.infra.tracing.sms_tracer import SmsTracer, SmsTracerConfig
+from com.nasa.services import sms_service
+from com.nasa.services.job_dispatcher_service import JobDispatcherService, ModemTask
+from com.nasa.services.sms_service import SmsService
+
+
+@pytest.fixture
+def jobs():
+    return RedisJobQueue(fakeredis.FakeRedis(decode_responses=True), RedisJobQueueConfig(rate_limit_per_s=0))
+
+
+def test_submit_claim_and_results(jobs):
+    job_id = jobs.submit("at", "AT+CSQ", targets=["86"])
+    assert [j["id"] for j in jobs.pending_jobs()] == [job_id]
+    assert jobs.claim(job_id, "86", "h1")
+    assert not jobs.claim(job_id, "86", "h2")
+
+    jobs.put_result(jobs.get_job(job_id), "86", {"status": "ok"})
+    assert jobs.results(job_id) == {"86": {"status": "ok"}}
+    # đủ kết quả cho mọi target -> job rời pending
+    assert jobs.pending_jobs() == []
+
+
+@pytest.mark.parametrize("timeout_s", [0, -1, RedisJobQueue.MAX_TIMEOUT_S + 1])
+def test_submit_rejects_bad_timeout(jobs, timeout_s):
+    with pytest.raises(ValueError):
+        jobs.submit("ussd", "*101#", timeout_s=timeout_s)
+
+
+class _BusyService:
+    """idle=True lúc dispatcher check nhưng submit_task từ chối (vừa nhận SMS)."""
+    msisdn = "0911111111"
+    idle = True
+
+    def __init__(self, accept):
+        self.accept = accept
+        self.tasks = []
+
+    def submit_task(self, task):
+        if self.accept:
+            self.tasks.append(task)
+        return self.accept
+
+
+def _handle(service):
+    return SimpleNamespace(thread=SimpleNamespace(is_alive=lambda: True), service=service)
+
+
+def test_failed_submit_drops_claim_instead_of_result(jobs):
+    job_id = jobs.submit("at", "AT+CSQ", targets=["+84911111111"])
+    busy = _BusyService(accept=False)
+    d = JobDispatcherService(jobs, lambda: {"86": _handle(busy)}, "h1")
+    assert d.dispatch_once() == 0
+    assert jobs.claimed(job_id) == {}
+    assert jobs.results(job_id) == {}
+
+    busy.accept = True
+    assert d.dispatch_once() == 1
+    assert jobs.claimed(job_id) == {"86": "h1"}
+
+
+class _FakeModem:
+    """Đủ API SerialModem cho SmsService.run_forever, ghi lại thứ tự lệnh."""
+
+    def __init__(self, cfg, lines, stop):
+        self.cfg = cfg
+        self.lines = lines
+        self.stop = stop
+        self.calls = []
+        self.last_rx_at = 0.0
+
+    def init_for_sms(self):
+        pass
+
+    def get_MSISDN101(self):
+        return "0911111111"
+
+    def delete_all_sms(self):
+        pass
+
+    def iter_lines(self, stop_event):
+        yield from self.lines
+        self.stop()
+
+    def parse_cmti_index(self, line):
+        return int(line.rsplit(",", 1)[1])
+
+    def read_sms(self, idx):
+        self.calls.append(("cmgr", idx))
+        return ""
+
+    def send(self, cmd, max_wait_seconds=2.0, flush_input=True):
+        self.calls.append(("send", cmd, max_wait_seconds, flush_input))
+        return "\r\n+CMTI: \"SM\",7\r\nOK\r\n"
+
+    def cancel_read(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_line_handled_before_task_and_task_keeps_urcs(monkeypatch):
+    modems = []
+
+    def factory(cfg):
+        m = _FakeModem(cfg, ['+CMTI: "SM",3\r\n', ""], svc.stop)
+        modems.append(m)
+        return m
+
+    monkeypatch.setattr(sms_service, "SerialModem", factory)
+    pipeline = SimpleNamespace(tracer=SmsTracer(SmsTracerConfig(enabled=False)), submit=lambda raw: True)
+    svc = SmsService("COM5", "86", 115200, 0.1, 0.1, False, pipeline)
+    done = []
+    svc._task = ModemTask(job={"id": "j1", "action": "at", "command": "AT+CSQ", "timeout_s": 300},
+                          on_done=done.append)
+
+    t = threading.Thread(target=svc.run_forever)
+    t.start()
+    t.join(2)
+    assert not t.is_alive()
+
+    assert modems[0].calls == [
+        ("cmgr", 3),
+        # timeout bị chặn, không flush input
+        ("send", "AT+CSQ", RedisJobQueue.MAX_TIMEOUT_S, False),
+        # +CMTI lẫn trong response của task vẫn được đọc
+        ("cmgr", 7),
+    ]
+    assert done and done[0]["status"] == "ok"
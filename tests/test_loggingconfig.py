@@ -0,0 +1,49 @@
+import logging
+import queue
+
+from com.nasa.app.loggingconfig import RateLimitFilter, _DropOnFullQueueHandler
+
+
+def _record(msg="AT TIMEOUT port=%s", port="COM5", level=logging.WARNING):
+    return logging.LogRecord("com.nasa.test", level, __file__, 1, msg, (port,), None)
+
+
+def test_rate_limit_per_key_and_suppressed_count():
+    f = RateLimitFilter(window_s=60, burst=2)
+    assert [f.filter(_record()) for _ in range(5)] == [True, True, False, False, False]
+    # port khác = key khác
+    assert f.filter(_record(port="COM6"))
+    # dưới min_level không bị giới hạn
+    assert all(f.filter(_record(level=logging.INFO)) for _ in range(10))
+
+    # hết cửa sổ: record kế tiếp đi qua kèm số record đã bị chặn
+    f._state[("com.nasa.test", "AT TIMEOUT port=%s", "COM5")][0] -= 61
+    rec = _record()
+    assert f.filter(rec)
+    assert "suppressed 3 similar" in rec.msg
+
+
+def test_dropped_records_are_reported():
+    q = queue.Queue(maxsize=2)
+    h = _DropOnFullQueueHandler(q, report_interval_s=0)
+    for _ in range(5):
+        h.enqueue(_record())
+    assert h.dropped == 3
+
+    q.get_nowait()
+    q.get_nowait()
+    h.enqueue(_record(msg="next %s"))
+    report, nxt = q.get_nowait(), q.get_nowait()
+    assert report.levelno == logging.WARNING and report.getMessage() == "log queue full: dropped 3 records (total 3)"
+    assert nxt.getMessage() == "next COM5"
+    assert h.drop_report() is None
+
+
+def test_report_retried_when_queue_still_full():
+    q = queue.Queue(maxsize=1)
+    h = _DropOnFullQueueHandler(q, report_interval_s=0)
+    h.enqueue(_record())
+    h.enqueue(_record())          # drop 1
+    h.enqueue(_record())          # report không vào được queue -> vẫn chờ báo, drop thêm 1
+    assert h.dropped == 2
+    assert h.drop_report().args == (2, 2)
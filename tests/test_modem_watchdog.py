@@ -0,0 +1,100 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from com.nasa.infra.serial import serial_modem
+from com.nasa.infra.serial.serial_modem import SerialConfig, SerialModem
+from com.nasa.services.modem_watchdog_service import ModemHungError, ModemWatchdog, ModemWatchdogConfig
+from com.nasa.services.sms_service import SmsService
+
+
+class _Modem:
+    """Modem giả: `alive` quyết định heartbeat `AT` có được trả lời hay không."""
+
+    def __init__(self, alive=False, alive_after_reopen=False):
+        self.cfg = SimpleNamespace(port="COM5")
+        self.last_rx_at = 0.0
+        self.alive = alive
+        self.alive_after_reopen = alive_after_reopen
+        self.sent = []
+        self.reopens = 0
+
+    def send(self, cmd, max_wait_seconds=2.0, flush_input=True):
+        self.sent.append(cmd)
+        return "\r\nOK\r\n" if self.alive else ""
+
+    def reopen(self):
+        self.reopens += 1
+        self.alive = self.alive or self.alive_after_reopen
+
+    def init_for_sms(self):
+        pass
+
+
+CFG = ModemWatchdogConfig(idle_s=0, max_failures=2, reset_wait_s=0)
+
+
+def test_heartbeat_failures_degrade_then_recover():
+    modem = _Modem()
+    wd = ModemWatchdog(CFG, modem, "86", threading.Event())
+    assert wd.tick() == "" and wd.state == "degraded" and wd.failures == 1
+    modem.alive = True
+    assert "OK" in wd.tick()
+    assert wd.state == "ok" and wd.failures == 0
+
+
+def test_escalation_soft_reset_recovers():
+    modem = _Modem(alive_after_reopen=True)
+    wd = ModemWatchdog(CFG, modem, "86", threading.Event())
+    wd.tick()
+    wd.tick()
+    assert "AT+CFUN=1,1" in modem.sent
+    assert modem.reopens == 1 and wd.state == "ok" and wd.recoveries == 1
+
+
+def test_escalation_gives_up_with_modem_hung():
+    modem = _Modem()
+    wd = ModemWatchdog(CFG, modem, "86", threading.Event())
+    wd.tick()
+    with pytest.raises(ModemHungError):
+        wd.tick()
+    # soft reset + reopen
+    assert modem.reopens == 2
+
+
+def test_health_reads_watchdog_state_live():
+    svc = SmsService("COM5", "86", 115200, 0.1, 0.1, False, pipeline=None)
+    assert svc.health == "starting"
+    svc.watchdog = ModemWatchdog(CFG, _Modem(), "86", threading.Event())
+    svc._lifecycle = "ok"
+    svc.watchdog.state = "recovering"
+    assert svc.health == "recovering"
+
+
+class _FlakySerial:
+    def __init__(self, *args, **kwargs):
+        self.fails = 0
+        self.reads = 0
+
+    def readline(self):
+        self.reads += 1
+        if self.reads <= self.fails:
+            raise OSError("device reports readiness to read but returned no data")
+        return b"OK\r\n"
+
+
+def test_iter_lines_backs_off_then_gives_up(monkeypatch):
+    monkeypatch.setattr(serial_modem.serial, "Serial", _FlakySerial)
+    modem = SerialModem(SerialConfig(port="COM5", baudrate=115200, timeout_seconds=0.1))
+    waits = []
+    stop = SimpleNamespace(is_set=lambda: False, wait=waits.append)
+
+    modem.ser.fails = 2
+    lines = modem.iter_lines(stop, max_read_errors=3)
+    assert next(lines) == "OK\r\n"
+    assert waits == [0.1, 0.2]
+
+    modem.ser.fails, modem.ser.reads = 5, 0
+    with pytest.raises(OSError):
+        list(modem.iter_lines(stop, max_read_errors=3))
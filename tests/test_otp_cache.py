@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # Lua cho fakeredis
+
+from com.nasa.cache.redis.otp_cache import RedisOtpCache, RedisOtpCacheConfig
+from com.nasa.entities.otp_message import OtpMessage
+
+T0 = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _msg(otp, sender="VCB", msisdn="+84911111111", dt_s=0):
+    return OtpMessage(otp=otp, sender=sender, imei="86", msisdn=msisdn, port="COM5",
+                      received_at=T0 + timedelta(seconds=dt_s), text=f"OTP {otp}", timestamp="", sms_index=1)
+
+
+@pytest.fixture(params=["json", "bin"])
+def cache(request):
+    return RedisOtpCache(fakeredis.FakeRedis(), RedisOtpCacheConfig(ttl_seconds=300, key_prefix="otp:",
+                                                                    value_format=request.param))
+
+
+def test_older_otp_does_not_replace_latest(cache):
+    assert cache.put(_msg("222222", dt_s=2))
+    assert cache.put(_msg("111111", dt_s=1))   # SMS tới trễ
+    assert cache.get_latest("0911111111", "VCB").otp == "222222"
+    assert cache.get("VCB").otp == "222222"
+    # vẫn có trong index
+    assert [m.otp for m in cache.since("0911111111", T0)] == ["111111", "222222"]
+
+    assert cache.put(_msg("333333", dt_s=3))
+    assert cache.get_latest("0911111111", "VCB").otp == "333333"
+
+
+def test_mget_latest_and_latest_for_msisdns(cache):
+    cache.put(_msg("111111", sender="VCB"))
+    cache.put(_msg("222222", sender="TCB", dt_s=1))
+    cache.put(_msg("333333", sender="VCB", msisdn="0922222222"))
+
+    got = cache.mget_latest([("0911111111", "VCB"), ("+84911111111", "TCB"), ("0922222222", "VCB"),
+                             ("0933333333", "VCB")])
+    assert [m.otp if m else None for m in got] == ["111111", "222222", "333333", None]
+    assert cache.mget_latest([]) == []
+
+    latest = cache.latest_for_msisdns(["0911111111", "0933333333"])
+    assert latest["0911111111"].otp == "222222" and latest["0933333333"] is None
+
+
+def test_since_applies_limit_after_sender_filter(cache):
+    for i in range(5):
+        cache.put(_msg(f"10000{i}", sender="TCB", dt_s=i))
+    cache.put(_msg("999999", sender="VCB", dt_s=10))
+    cache.put(_msg("888888", sender="VCB", dt_s=11))
+
+    assert [m.otp for m in cache.since("0911111111", T0, sender="VCB", limit=1)] == ["999999"]
+    assert [m.otp for m in cache.since("0911111111", T0, sender="VCB")] == ["999999", "888888"]
+    assert len(cache.since("0911111111", T0, limit=3)) == 3
+    assert [m.otp for m in cache.since("0911111111", T0 + timedelta(seconds=11))] == ["888888"]
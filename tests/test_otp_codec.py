@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from com.nasa.entities.otp_message import OtpMessage
+from com.nasa.infra.utils.otp_codec import OtpCodec
+
+
+def _msg(text="Ma OTP 123456. Có hiệu lực 5 phút", msisdn="0912345678"):
+    return OtpMessage(otp="123456", sender="VCB", imei="861234567890123", msisdn=msisdn, port="/dev/ttyUSB3",
+                      received_at=datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+                      text=text, timestamp="24/01/02,10:11:12+28", sms_index=12)
+
+
+@pytest.mark.parametrize("fmt", OtpCodec.FORMATS)
+def test_round_trip(fmt):
+    msg = _msg()
+    assert OtpCodec.decode(OtpCodec(fmt).encode(msg)) == msg
+
+
+@pytest.mark.parametrize("fmt", OtpCodec.FORMATS)
+def test_round_trip_long_text_and_empty_msisdn(fmt):
+    # text > 127 bytes: varint length 2 byte ở format bin
+    msg = _msg(text="ư" * 300, msisdn="")
+    assert OtpCodec.decode(OtpCodec(fmt).encode(msg)) == msg
+
+
+def test_decode_accepts_str_and_legacy_json_without_msisdn():
+    legacy = ('{"otp":"1234","sender":"VCB","text":"t","timestamp":"","received_at":"2024-01-02T03:04:05+00:00",'
+              '"port":"COM5","imei":"86","index":3}')
+    msg = OtpCodec.decode(legacy)
+    assert (msg.otp, msg.msisdn, msg.sms_index) == ("1234", "", 3)
+
+
+def test_unknown_format_and_tag():
+    with pytest.raises(ValueError):
+        OtpCodec("msgpack")
+    with pytest.raises(ValueError):
+        OtpCodec.decode(b"\x7fgarbage")
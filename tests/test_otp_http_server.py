@@ -0,0 +1,47 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # Lua cho fakeredis
+
+from com.nasa.cache.memory.recent_otp_index import RecentOtpIndex
+from com.nasa.cache.redis.sim_pool import RedisSimPool, RedisSimPoolConfig
+from com.nasa.infra.http.otp_http_server import OtpHttpConfig, OtpHttpServer
+
+
+@pytest.fixture
+def server():
+    pool = RedisSimPool(fakeredis.FakeRedis(decode_responses=True), RedisSimPoolConfig())
+    pool.sync(["0911111111"])
+    srv = OtpHttpServer(OtpHttpConfig(port=0), RecentOtpIndex(), pool)
+    srv.start()
+    yield srv
+    srv.stop()
+
+
+def _post(srv, path):
+    req = urllib.request.Request(f"http://127.0.0.1:{srv.port}{path}", method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, json.loads(r.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+
+def test_release_requires_matching_lease_id(server):
+    status, lease = _post(server, "/sim/lease?sender=VCB&consumer=a")
+    assert status == 200
+
+    assert _post(server, f"/sim/release?msisdn={lease['msisdn']}")[0] == 400
+    assert _post(server, f"/sim/release?msisdn={lease['msisdn']}&lease_id=other")[0] == 409
+    assert _post(server, f"/sim/release?msisdn={lease['msisdn']}&lease_id={lease['lease_id']}") == \
+        (200, {"released": True})
+
+
+@pytest.mark.parametrize("ttl", ["0", "-1", "abc"])
+def test_lease_rejects_bad_ttl(server, ttl):
+    assert _post(server, f"/sim/lease?sender=VCB&ttl={ttl}")[0] == 400
+    assert server.sim_pool.stats()["leased"] == 0
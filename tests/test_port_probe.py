@@ -0,0 +1,18 @@
+from com.nasa.infra.serial.port_probe import parse_ipr_rates
+
+CANDIDATES = (921600, 460800, 230400)
+
+
+def test_ipr_list_form():
+    resp = "\r\n+IPR: (0,300,600,1200,2400,4800,9600,19200,38400,57600,115200,230400,460800),()\r\n\r\nOK\r\n"
+    assert parse_ipr_rates(resp, CANDIDATES) == [460800, 230400]
+
+
+def test_ipr_range_form():
+    assert parse_ipr_rates("+IPR: (300-3000000)\r\nOK", CANDIDATES) == [921600, 460800, 230400]
+    assert parse_ipr_rates("+IPR: (300-500000)\r\nOK", CANDIDATES) == [460800, 230400]
+
+
+def test_ipr_unparsable():
+    assert parse_ipr_rates("ERROR", CANDIDATES) == []
+    assert parse_ipr_rates("", CANDIDATES) == []
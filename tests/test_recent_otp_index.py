@@ -0,0 +1,59 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from com.nasa.cache.memory.recent_otp_index import RecentOtpIndex
+from com.nasa.entities.otp_message import OtpMessage
+
+T0 = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+T0_MS = int(T0.timestamp() * 1000)
+
+
+def _msg(otp, sender="VCB", msisdn="+84911111111", dt_s=0):
+    return OtpMessage(otp=otp, sender=sender, imei="86", msisdn=msisdn, port="COM5",
+                      received_at=T0 + timedelta(seconds=dt_s), text="", timestamp="", sms_index=1)
+
+
+def test_latest_by_owner_sender_and_since():
+    idx = RecentOtpIndex()
+    idx.add(_msg("111111"))
+    idx.add(_msg("222222", sender="TCB", dt_s=1))
+    idx.add(_msg("333333", msisdn="0922222222"))
+
+    # MSISDN được chuẩn hoá như RedisOtpCache
+    assert idx.latest("0911111111").otp == "222222"
+    assert idx.latest("+84911111111", sender="VCB").otp == "111111"
+    assert idx.latest("0911111111", sender="VCB", since_ms=T0_MS + 1) is None
+    assert idx.latest("0933333333") is None
+
+
+def test_wait_wakes_up_on_add():
+    idx = RecentOtpIndex()
+    got = []
+    t = threading.Thread(target=lambda: got.append(idx.wait("0911111111", "VCB", T0_MS, timeout_s=5)))
+    t.start()
+    time.sleep(0.05)
+    idx.add(_msg("999999", sender="TCB"))      # sender khác: chưa đánh thức được
+    time.sleep(0.05)
+    assert t.is_alive()
+    idx.add(_msg("123456"))
+    t.join(1)
+    assert not t.is_alive() and got[0].otp == "123456"
+
+
+def test_wait_timeout_and_eviction():
+    idx = RecentOtpIndex(max_entries=2)
+    t0 = time.monotonic()
+    assert idx.wait("0911111111", None, 0, timeout_s=0.05) is None
+    assert time.monotonic() - t0 >= 0.05
+
+    for i in range(3):
+        idx.add(_msg(f"00000{i}", sender=f"S{i}"))
+    assert len(idx) == 2
+    assert idx.latest("0911111111", sender="S0") is None
+    assert idx.latest("0911111111", sender="S2").otp == "000002"
+
+    idx = RecentOtpIndex(ttl_s=0.01)
+    idx.add(_msg("111111"))
+    time.sleep(0.02)
+    assert idx.latest("0911111111") is None and len(idx) == 0
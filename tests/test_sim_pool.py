@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # Lua cho fakeredis
+
+from com.nasa.cache.redis.sim_pool import RedisSimPool, RedisSimPoolConfig
+from com.nasa.entities.otp_message import OtpMessage
+
+
+@pytest.fixture
+def pool():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    p = RedisSimPool(client, RedisSimPoolConfig(lease_ttl_seconds=60, cooldown_seconds=60))
+    p.sync(["+84911111111", "0922222222"])
+    return p
+
+
+def _otp(msisdn, sender):
+    return OtpMessage(otp="1234", sender=sender, imei="86", msisdn=msisdn, port="p",
+                      received_at=datetime.now(timezone.utc), text="", timestamp="", sms_index=1)
+
+
+def test_lease_is_exclusive_until_pool_is_empty(pool):
+    a, b = pool.lease("VCB"), pool.lease("VCB")
+    assert {a.msisdn, b.msisdn} == {"0911111111", "0922222222"}
+    assert pool.lease("VCB") is None
+    assert pool.stats() == {"free": 0, "leased": 2, "alive": 2}
+
+
+def test_release_checks_lease_id(pool):
+    lease = pool.lease()
+    assert pool.release(lease.msisdn, "wrong") == -1
+    assert pool.release(lease.msisdn, lease.lease_id) == 1
+    assert pool.release(lease.msisdn, lease.lease_id) == 0
+    assert pool.stats()["free"] == 2
+
+
+def test_cooldown_per_sender(pool):
+    lease = pool.lease("VCB")
+    pool.release(lease.msisdn, lease.lease_id)
+    other = pool.lease("VCB")
+    assert other.msisdn != lease.msisdn      # SIM vừa nhận OTP của VCB đang cooldown với VCB
+    assert pool.lease("VCB") is None
+    assert pool.lease("TCB").msisdn == lease.msisdn
+
+
+def test_release_on_otp_matches_sender(pool):
+    lease = pool.lease("VCB")
+    pool.release_on_otp(_otp("+84" + lease.msisdn[1:], "OTHER"))
+    assert pool.get_lease(lease.msisdn)
+    pool.release_on_otp(_otp("+84" + lease.msisdn[1:], "vcb"))
+    assert not pool.get_lease(lease.msisdn)
+
+
+def test_sync_removes_dead_sims(pool):
+    pool.sync(["0911111111"], dead=["0922222222"])
+    assert pool.lease().msisdn == "0911111111"
+    assert pool.lease() is None
+
+
+def test_cooling_sims_at_head_do_not_hide_free_sims():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    p = RedisSimPool(client, RedisSimPoolConfig(strategy="least_loaded", max_scan=2, cooldown_seconds=60))
+    sims = [f"09{i:08d}" for i in range(5)]
+    p.sync(sims)
+    # 3 SIM đầu pool (ít lease nhất) đang cooldown với VCB, vượt max_scan
+    for m in sims[:3]:
+        lease = p.lease("VCB")
+        assert lease.msisdn == m
+        p.release(m, lease.lease_id)
+    client.zadd("sim:free", {m: 0 for m in sims[:3]})
+
+    assert p.lease("VCB").msisdn == sims[3]
+    assert p.lease("TCB").msisdn == sims[0]
+
+
+def test_lease_rejects_non_positive_ttl(pool):
+    for ttl in (0, -5, float("inf")):
+        with pytest.raises(ValueError):
+            pool.lease("VCB", ttl_s=ttl)
+    assert pool.stats()["leased"] == 0
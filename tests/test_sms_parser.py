@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from com.nasa.infra.parser.sms_parser import parse_smsc_timestamp
+
+
+@pytest.mark.parametrize("ts, offset_min", [
+    ("24/01/02,10:11:12+28", 7 * 60),
+    ("24/01/02,10:11:12+00", 0),
+    ("24/01/02,10:11:12-20", -5 * 60),
+    ("24/01/02,10:11:12+22", 5 * 60 + 30),   # phần tư giờ: UTC+5:30
+])
+def test_smsc_timestamp_quarter_hours(ts, offset_min):
+    dt = parse_smsc_timestamp(ts)
+    assert dt.utcoffset() == timedelta(minutes=offset_min)
+    assert dt.replace(tzinfo=None) == datetime(2024, 1, 2, 10, 11, 12)
+
+
+def test_smsc_timestamp_invalid():
+    assert parse_smsc_timestamp("garbage") is None
+    assert parse_smsc_timestamp("24/13/40,10:11:12+28") is None
@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from com.nasa.infra.tracing.sms_tracer import SmsTrace, SmsTracer, SmsTracerConfig
+from com.nasa.services.otp_extract_service import OtpExtractService
+from com.nasa.services.sms_pipeline_service import RawSms, SmsPipeline, SmsPipelineConfig
+from com.nasa.services.sms_service import SmsService
+
+
+def _cmgr(otp: str) -> str:
+    return f'\r\n+CMGR: "REC UNREAD","VCB",,"24/01/02,10:11:12+28"\r\nMa OTP {otp}\r\n\r\nOK\r\n'
+
+
+def _raw(msisdn: str, otp: str, idx: int = 1) -> RawSms:
+    return RawSms(imei="86" + msisdn, port="COM" + msisdn[-1], msisdn=msisdn, index=idx, resp=_cmgr(otp),
+                  received_at=datetime.now(timezone.utc))
+
+
+class _SlowCache:
+    """Redis chậm ngẫu nhiên: OTP vượt mặt nhau nếu pipeline không giữ thứ tự theo owner."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.puts = []
+
+    def put(self, msg):
+        time.sleep(random.random() * 0.003)
+        with self.lock:
+            self.puts.append((msg.msisdn, msg.otp))
+        return True
+
+
+def _pipeline(cache, **kw) -> SmsPipeline:
+    cfg = SmsPipelineConfig(metrics_interval_s=0, **kw)
+    return SmsPipeline(cfg, OtpExtractService(r"\b(\d{6})\b"), cache)
+
+
+def test_otps_of_one_sim_are_committed_in_order():
+    cache = _SlowCache()
+    p = _pipeline(cache, parse_workers=4, publish_workers=4)
+    p.start()
+    sims = ["0911111111", "0922222222", "0933333333"]
+    sent = {m: [] for m in sims}
+    for i in range(60):
+        m = sims[i % len(sims)]
+        otp = f"{100000 + i}"
+        sent[m].append(otp)
+        assert p.submit(_raw(m, otp, i))
+    p.stop()
+
+    for m in sims:
+        assert [otp for msisdn, otp in cache.puts if msisdn == m] == sent[m]
+
+
+def test_full_parse_queue_drops_without_blocking_caller():
+    # không start worker -> queue đầy sau 1 SMS
+    p = _pipeline(_SlowCache(), parse_workers=1, queue_size=1, enqueue_timeout_s=0.01)
+    assert p.submit(_raw("0911111111", "111111"))
+    t0 = time.monotonic()
+    assert not p.submit(_raw("0911111111", "222222"))
+    assert time.monotonic() - t0 < 0.5
+    snap = p.parse_metrics.snapshot()
+    assert snap["dropped"] == 1 and snap["enqueued"] == 1
+
+
+class _Modem:
+    def __init__(self, resp):
+        self.resp = resp
+        self.deleted = []
+
+    def read_sms(self, idx):
+        return self.resp
+
+    def delete_sms(self, idx):
+        self.deleted.append(idx)
+
+
+@pytest.mark.parametrize("resp, accepted, deleted", [
+    (_cmgr("123456"), True, [5]),
+    (_cmgr("123456"), False, []),                                   # pipeline đầy -> giữ trên SIM
+    (None, True, []),
+    ("", True, []),
+    ("\r\nERROR\r\n", True, []),
+    ('\r\n+CMGR: "REC UNREAD","VCB",,"24/01/02,10:11:12+28"\r\nMa OT', True, []),   # timeout giữa chừng
+])
+def test_sms_deleted_only_after_complete_read(resp, accepted, deleted):
+    pipeline = SimpleNamespace(tracer=SmsTracer(SmsTracerConfig(enabled=False)), submit=lambda raw: accepted)
+    svc = SmsService("COM5", "86", 115200, 0.1, 0.1, True, pipeline)
+    modem = _Modem(resp)
+    svc._process_sms(modem, 5, "0911111111", SmsTrace("86", "COM5"))
+    assert modem.deleted == deleted